@@ -1,16 +1,21 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file, session
-import methods_file
-from urllib.parse import urlparse
-from selenium import webdriver
-import base64
-from datetime import timezone, datetime
-import io
+from flask import Flask, render_template, request, redirect, url_for, send_file, session, jsonify, Response
+import article_cache
+import assets
+import job_queue
+from urllib.parse import quote
+import renderer_pool
+import render_backend
 import os
 import sys
-from bs4 import BeautifulSoup
 
+# read once here so gunicorn --preload workers share them
+assets.preload()
 app = Flask(__name__, template_folder='./frontend/templates', static_folder='./frontend/static')
 app.secret_key = 'bhaisa'
+PDF_CHUNK_SIZE = 64 * 1024
+# JOB_QUEUE=0 renders inside the request like before, otherwise `python job_queue.py` workers do it
+USE_JOB_QUEUE = os.environ.get('JOB_QUEUE', '1') != '0'
+JOB_RETRY_AFTER = 3
 
 
 @app.route('/', methods=['POST', 'GET'])
@@ -28,24 +33,92 @@ def hello_world():
 @app.route("/get_pdf", methods=['POST', 'GET'])
 def get_pdf():
     url = session['get_pdf']['url']
-    method_object = methods_file.GetResourceMethods()
-    parsed_uri = urlparse(url)
-    result = '{uri.scheme}://{uri.netloc}/'.format(uri=parsed_uri)
-    html_str, title_txt = method_object.select_parser(input_url_host_only=result, url_full=url)
-    # return html_str
-    if html_str and title_txt:
-        outfile = make_html_pdf(html_str)
-        print(f'{outfile} created', file=sys.stdout)
-        # return send_file(outfile, attachment_filename='title_txt.pdf')
-        return_data = io.BytesIO()
-        with open(outfile, 'rb') as fo:
-            return_data.write(fo.read())
-        # (after writing, cursor will be at last byte, so move it to start)
-        return_data.seek(0)
-        os.remove(outfile)
-        print(f'{outfile} deleted', file=sys.stdout)
-        return send_file(return_data, mimetype='application/pdf',
-                         attachment_filename=f'{title_txt}.pdf')
+    renderer = session['get_pdf'].get('renderer')
+    cached = article_cache.default_cache.get(url, render_backend.backend_name(renderer))
+    if cached and cached.Pdf_Path:
+        print(f'{url} served from cache', file=sys.stdout)
+        return send_file(cached.Pdf_Path, mimetype='application/pdf', conditional=True,
+                         attachment_filename=f'{cached.Title}.pdf')
+    if not USE_JOB_QUEUE:
+        # the parsers (bs4, selenium, ...) are only loaded by web processes that render themselves
+        import article_pipeline
+        pdf_file, title_txt = article_pipeline.article_pdf(url, renderer=renderer)
+        if pdf_file is None:
+            return '<h1> Could not compile this url</h1>', 422
+        if isinstance(pdf_file, str):
+            # served from disk like any cache hit, with Content-Length and Range support
+            return send_file(pdf_file, mimetype='application/pdf', conditional=True,
+                             attachment_filename=f'{title_txt}.pdf')
+        return stream_pdf(pdf_file, title_txt)
+    try:
+        job_id = job_queue.default_queue.enqueue(url, renderer)
+    except job_queue.QueueFull:
+        response = Response('<h1> Too many pdfs being compiled, try again shortly</h1>', status=503)
+        response.headers['Retry-After'] = str(JOB_RETRY_AFTER)
+        return response
+    print(f'{url} queued as job {job_id}', file=sys.stdout)
+    return redirect(url_for('job_status', job_id=job_id))
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_queue.default_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'unknown job'}), 404
+    wants_json = request.accept_mimetypes.best_match(['application/json', 'text/html']) == 'application/json'
+    if job.Status == 'done' and not wants_json:
+        return redirect(url_for('job_result', job_id=job_id))
+    if wants_json:
+        return jsonify({'id': job.Id, 'url': job.Url, 'status': job.Status, 'error': job.Error,
+                        'title': job.Title, 'created_at': job.Created_At, 'finished_at': job.Finished_At,
+                        'result': url_for('job_result', job_id=job_id) if job.Status == 'done' else None})
+    if job.Status == 'failed':
+        return f'<h1> Could not compile {job.Url}</h1><p>{job.Error}</p>', 422
+    # browsers keep polling through the refresh until the redirect to the result kicks in
+    response = Response(f'<meta http-equiv="refresh" content="{JOB_RETRY_AFTER}">'
+                        f'<h1> Compiling {job.Url} ({job.Status})</h1>')
+    response.headers['Retry-After'] = str(JOB_RETRY_AFTER)
+    return response, 202
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = job_queue.default_queue.get(job_id)
+    if not job or job.Status != 'done':
+        return jsonify({'error': 'no result for this job'}), 404
+    if not os.path.exists(job.Result):
+        # evicted from the article cache since the job finished
+        return jsonify({'error': 'result expired, request the pdf again'}), 410
+    return send_file(job.Result, mimetype='application/pdf', conditional=True,
+                     attachment_filename=f'{job.Title}.pdf')
+
+
+def stream_pdf(pdf_file, title_txt):
+    """
+    send an open pdf buffer in PDF_CHUNK_SIZE chunks, the buffer is closed once the response ends
+
+    :param pdf_file: binary file object, e.g. the spooled buffer from make_html_pdf
+    :param title_txt: used for the download file name
+    :return: streamed flask response
+    """
+    pdf_file.seek(0, os.SEEK_END)
+    length = pdf_file.tell()
+    pdf_file.seek(0)
+
+    def generate():
+        try:
+            while True:
+                chunk = pdf_file.read(PDF_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            pdf_file.close()
+
+    response = Response(generate(), mimetype='application/pdf', direct_passthrough=True)
+    response.headers['Content-Length'] = str(length)
+    response.headers['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(f'{title_txt}.pdf')}"
+    return response
 
 
 # @app.route("/get_summary", methods=['POST', 'GET'])
@@ -62,31 +135,14 @@ def get_pdf():
 #         return_html += item.text
 #     return return_html
 
-def make_html_pdf(html_str):
-    """Download the currently displayed page to target_path."""
-    dt = datetime.now()
-    utc_time = dt.replace(tzinfo=timezone.utc)
-    utc_timestamp = utc_time.timestamp()
-    driver = webdriver.PhantomJS()
-    html_bs64 = base64.b64encode(html_str.encode('utf-8')).decode()
-    driver.get("data:text/html;base64," + html_bs64)
-
-    def execute(script, args):
-        driver.execute('executePhantomScript', {'script': script, 'args': args})
-
-    # hack while the python interface lags
-    driver.command_executor._commands['executePhantomScript'] = ('POST', '/session/$sessionId/phantom/execute')
-    # set page format
-    # inside the execution script, web_page is "this"
-    with open('papersize.js', 'r') as gu:
-        temp_script = gu.read()
-    page_format = f'this.{temp_script};'
-    execute(page_format, [])
-
-    # render current page
-    render = '''this.render("{}")'''.format(f'{utc_timestamp}.pdf')
-    execute(render, [])
-    return f'{utc_timestamp}.pdf'
+def make_html_pdf(html_str, renderer=None):
+    """Render html_str with the chosen render_backend into a rewound in-memory buffer."""
+    return render_backend.render_pdf(html_str, renderer)
+
+
+@app.route("/renderer_stats")
+def renderer_stats():
+    return jsonify(renderer_pool.stats())
 
 
 if __name__ == '__main__':
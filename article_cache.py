@@ -0,0 +1,219 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+import http_session
+
+
+ARTICLE_CACHE_DIR = os.environ.get('ARTICLE_CACHE_DIR', 'article_cache')
+# entries younger than this are served without asking the origin
+ARTICLE_TTL = 6 * 3600
+# html + pdf bytes kept on disk before the least recently used entries are evicted
+ARTICLE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid')
+
+Cache_Entry = namedtuple(typename='Cache_Entry',
+                         field_names=['Url', 'Title', 'Html', 'Pdf_Path', 'Etag', 'Last_Modified'])
+
+
+def canonical_url(url):
+    """
+    cache key for an article, the same story reached through tracking links maps to one entry
+
+    :param url: url as typed or shared
+    :return: normalized url
+    """
+    parsed_uri = urlparse(url.strip())
+    scheme = parsed_uri.scheme.lower() or 'https'
+    netloc = parsed_uri.netloc.lower()
+    if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = [(key, value) for key, value in parse_qsl(parsed_uri.query, keep_blank_values=True)
+             if not key.lower().startswith(TRACKING_PARAMS)]
+    path = parsed_uri.path or '/'
+    return urlunparse((scheme, netloc, path, '', urlencode(sorted(query)), ''))
+
+
+class ArticleCache:
+    """
+    persistent cache of the cleaned html from select_parser and the rendered pdf, keyed by the
+    canonical url. the index is sqlite, pdfs are plain files so they can be sent with send_file
+    """
+
+    def __init__(self, cache_dir=ARTICLE_CACHE_DIR, ttl=ARTICLE_TTL, max_bytes=ARTICLE_CACHE_MAX_BYTES):
+        """
+
+        :param cache_dir: folder holding articles.sqlite3 and the pdf folder
+        :param ttl: seconds an entry is served before it is revalidated against the origin
+        :param max_bytes: total html + pdf size kept, least recently used entries go first
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, 'articles.sqlite3')
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    os.makedirs(os.path.join(self.cache_dir, 'pdf'), exist_ok=True)
+                    with closing(sqlite3.connect(self.index_path, timeout=30)) as conn, conn:
+                        conn.execute('CREATE TABLE IF NOT EXISTS articles (key TEXT PRIMARY KEY, url TEXT NOT NULL, '
+                                     'title TEXT, html TEXT, pdf_size INTEGER NOT NULL DEFAULT 0, '
+                                     'size INTEGER NOT NULL DEFAULT 0, etag TEXT, last_modified TEXT, '
+                                     'validated_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+                        conn.execute('CREATE INDEX IF NOT EXISTS articles_accessed ON articles (accessed_at)')
+                        # one pdf per render backend, their sizes add up to articles.pdf_size
+                        conn.execute('CREATE TABLE IF NOT EXISTS pdfs (key TEXT NOT NULL, backend TEXT NOT NULL, '
+                                     'size INTEGER NOT NULL, PRIMARY KEY (key, backend))')
+                    self._ready = True
+        return closing(sqlite3.connect(self.index_path, timeout=30))
+
+    def pdf_path(self, url, backend):
+        """
+
+        :param url: article url
+        :param backend: render_backend name, see render_backend.backend_name
+        :return: where the pdf of the article rendered by backend is kept
+        """
+        key = canonical_url(url)
+        return os.path.join(self.cache_dir, 'pdf', f'{hashlib.sha1(key.encode("utf-8")).hexdigest()}.{backend}.pdf')
+
+    def _drop_pdfs(self, conn, key):
+        backends = [row[0] for row in conn.execute('SELECT backend FROM pdfs WHERE key = ?', (key,))]
+        conn.execute('DELETE FROM pdfs WHERE key = ?', (key,))
+        for backend in backends:
+            try:
+                os.remove(self.pdf_path(key, backend))
+            except OSError:
+                pass
+
+    def _origin_unchanged(self, url, etag, last_modified):
+        if not etag and not last_modified:
+            return False
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            response = http_session.head(url, headers=headers)
+        except Exception as e:
+            print(f'revalidation failed for {url}\n\terror is: {e.__class__}')
+            return False
+        return response.status_code == 304
+
+    def get(self, url, backend=None):
+        """
+
+        :param url: article url
+        :param backend: render_backend name whose pdf is looked up, pdfs of other backends are not served
+        :return: Cache_Entry or None, Pdf_Path is None until a pdf of backend has been stored (always when
+                 backend is None)
+        """
+        key = canonical_url(url)
+        with self._connect() as conn:
+            row = conn.execute('SELECT title, html, etag, last_modified, validated_at FROM articles '
+                               'WHERE key = ?', (key,)).fetchone()
+        if not row:
+            return None
+        title, html, etag, last_modified, validated_at = row
+        now = time.time()
+        if now - validated_at > self.ttl:
+            if not self._origin_unchanged(key, etag, last_modified):
+                self.delete(url)
+                return None
+            with self._connect() as conn, conn:
+                conn.execute('UPDATE articles SET validated_at = ? WHERE key = ?', (now, key))
+        with self._connect() as conn, conn:
+            conn.execute('UPDATE articles SET accessed_at = ? WHERE key = ?', (now, key))
+            stored = backend and conn.execute('SELECT 1 FROM pdfs WHERE key = ? AND backend = ?',
+                                              (key, backend)).fetchone()
+        pdf_path = self.pdf_path(url, backend) if stored else None
+        if pdf_path and not os.path.exists(pdf_path):
+            pdf_path = None
+        return Cache_Entry(key, title, html, pdf_path, etag, last_modified)
+
+    def put_html(self, url, html, title, etag=None, last_modified=None):
+        """
+        store the output of select_parser
+
+        :param etag: ETag of the article response the parser fetched, if any
+        :param last_modified: its Last-Modified. without either the entry is scraped again on its first
+                              revalidation, which stores the validators of that fetch
+        :return: canonical url used as the key
+        """
+        key = canonical_url(url)
+        now = time.time()
+        size = len(html.encode('utf-8'))
+        with self._connect() as conn, conn:
+            # pdfs of the previous html are stale
+            self._drop_pdfs(conn, key)
+            conn.execute('INSERT OR REPLACE INTO articles (key, url, title, html, pdf_size, size, etag, last_modified, '
+                         'validated_at, accessed_at) VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?, ?)',
+                         (key, url, title, html, size, etag, last_modified, now, now))
+        self._evict()
+        return key
+
+    def put_pdf(self, url, pdf, backend):
+        """
+        store the rendered pdf of an article already added with put_html
+
+        :param pdf: pdf bytes or a binary file object, a file object is copied from its start and rewound
+        :param backend: render_backend name that rendered it
+        :return: path of the cached pdf or None when the html entry is gone
+        """
+        key = canonical_url(url)
+        pdf_path = self.pdf_path(url, backend)
+        with self._connect() as conn, conn:
+            row = conn.execute('SELECT size, pdf_size FROM articles WHERE key = ?', (key,)).fetchone()
+            if not row:
+                return None
+            previous = conn.execute('SELECT size FROM pdfs WHERE key = ? AND backend = ?', (key, backend)).fetchone()
+            previous = previous[0] if previous else 0
+            tmp_path = f'{pdf_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as pdf_write:
+                if isinstance(pdf, bytes):
+                    pdf_write.write(pdf)
+                else:
+                    pdf.seek(0)
+                    shutil.copyfileobj(pdf, pdf_write)
+                    pdf.seek(0)
+                pdf_size = pdf_write.tell()
+            os.replace(tmp_path, pdf_path)
+            conn.execute('INSERT OR REPLACE INTO pdfs (key, backend, size) VALUES (?, ?, ?)', (key, backend, pdf_size))
+            conn.execute('UPDATE articles SET pdf_size = ?, size = ? WHERE key = ?',
+                         (row[1] - previous + pdf_size, row[0] - previous + pdf_size, key))
+        self._evict()
+        return pdf_path
+
+    def delete(self, url):
+        key = canonical_url(url)
+        with self._connect() as conn, conn:
+            self._drop_pdfs(conn, key)
+            conn.execute('DELETE FROM articles WHERE key = ?', (key,))
+
+    def _evict(self):
+        with self._connect() as conn:
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM articles').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in conn.execute('SELECT key, size FROM articles ORDER BY accessed_at'):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+        for key in victims:
+            self.delete(key)
+
+
+default_cache = ArticleCache()
@@ -0,0 +1,87 @@
+import os
+
+import article_cache
+import methods_file
+import render_backend
+import singleflight
+
+
+# concurrent requests for one article share a single scrape and render, across processes too
+coalescer = singleflight.SingleFlight(lock_dir=os.path.join(article_cache.ARTICLE_CACHE_DIR, 'locks'))
+
+
+def scrape_article(url):
+    """
+    run select_parser for an article and keep the result in the article cache
+
+    :param url: article url
+    :return: html string and title, both None when the parser skipped the article
+    """
+    method_object = methods_file.GetResourceMethods()
+    html_str, title_txt = method_object.select_parser(url)
+    if html_str and title_txt:
+        etag, last_modified = method_object.validators.get(article_cache.canonical_url(url), (None, None))
+        article_cache.default_cache.put_html(url, html_str, title_txt, etag=etag, last_modified=last_modified)
+    return html_str, title_txt
+
+
+def article_html(url):
+    """
+
+    :param url: article url
+    :return: cleaned html and title, from the article cache or scraped
+    """
+    cached = article_cache.default_cache.get(url)
+    if cached:
+        return cached.Html, cached.Title
+    return scrape_article(url)
+
+
+def _cached_pdf(url, backend):
+    cached = article_cache.default_cache.get(url, backend)
+    if cached and cached.Pdf_Path:
+        return cached.Pdf_Path, cached.Title
+    return None
+
+
+def _render_article(url, backend):
+    cached = article_cache.default_cache.get(url, backend)
+    if cached and cached.Pdf_Path:
+        return cached.Pdf_Path, cached.Title
+    if cached:
+        html_str, title_txt = cached.Html, cached.Title
+    else:
+        html_str, title_txt = scrape_article(url)
+    if not html_str or not title_txt:
+        return None, None
+    return_data = render_backend.render_pdf(html_str, backend)
+    print(f'{url} rendered with {backend}')
+    cached_path = article_cache.default_cache.put_pdf(url, return_data, backend)
+    if cached_path:
+        return_data.close()
+        return cached_path, title_txt
+    return return_data, title_txt
+
+
+def article_pdf(url, renderer=None):
+    """
+    scrape if needed and render an article into the article cache, callers asking for the same
+    article at the same time wait for one render instead of starting their own
+
+    :param url: article url
+    :param renderer: render_backend name, the default backend if None. each backend's pdf is cached
+                     and coalesced on its own
+    :return: (pdf path or open pdf buffer, title), (None, None) when there is nothing to render.
+             a buffer is only returned when the cache could not keep the pdf, the caller closes it
+    """
+    backend = render_backend.backend_name(renderer)
+    cached = _cached_pdf(url, backend)
+    if cached:
+        return cached
+    result, leader = coalescer.do(f'{article_cache.canonical_url(url)}|{backend}',
+                                  lambda: _render_article(url, backend), recheck=lambda: _cached_pdf(url, backend))
+    pdf_file, title_txt = result
+    if not leader and pdf_file is not None and not isinstance(pdf_file, str):
+        # the leader's uncached buffer is its own to stream and close
+        return _render_article(url, backend)
+    return pdf_file, title_txt
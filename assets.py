@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+
+
+ASSET_DIR = os.environ.get('ASSET_DIR', os.path.dirname(os.path.abspath(__file__)))
+# dev mode: stat the files on every get and reload the ones that changed
+ASSETS_RELOAD = os.environ.get('ASSETS_RELOAD', '1' if os.environ.get('FLASK_ENV') == 'development' else '0') == '1'
+# stylesheets and scripts put into every article or render, loaded once per process
+ASSET_NAMES = ('print.css', 'wsj_style.css', 'papersize.js')
+
+_QUOTED = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+_CSS_SPACE = re.compile(rf'({_QUOTED})|/\*.*?\*/|\s+', re.S)
+_CSS_PUNCTUATION = re.compile(rf'({_QUOTED})|\s*([{{}};,>])\s*|:\s+')
+
+
+def minify_css(text):
+    """
+    drop comments and the whitespace around css punctuation, quoted strings are left as they are
+
+    :param text: css, optionally wrapped in the <style> tag the parsers put into the head
+    :return: minified text
+    """
+    text = _CSS_SPACE.sub(lambda m: m.group(1) or ('' if m.group(0).startswith('/*') else ' '), text)
+    return _CSS_PUNCTUATION.sub(lambda m: m.group(1) or m.group(2) or ':', text).strip()
+
+
+def minify_js(text):
+    """
+    only indentation and blank lines go, the line breaks stay so comments and asi keep working
+    """
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+class AssetRegistry:
+    """
+    static files read and minified once and served from memory afterwards. loading them before
+    gunicorn forks (--preload) leaves one copy shared by all workers
+    """
+
+    def __init__(self, base_dir=ASSET_DIR, reload=ASSETS_RELOAD, minify=True):
+        """
+
+        :param base_dir: folder the asset names are relative to
+        :param reload: check the modification time on every get, for development
+        :param minify: pass the files through MINIFIERS by extension
+        """
+        self.base_dir = base_dir
+        self.reload = reload
+        self.minify = minify
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        return os.path.join(self.base_dir, name)
+
+    def _load(self, name):
+        path = self.path(name)
+        mtime = os.stat(path).st_mtime
+        with open(path, encoding='utf8') as asset_file:
+            text = asset_file.read()
+        minifier = MINIFIERS.get(os.path.splitext(name)[1]) if self.minify else None
+        if minifier:
+            text = minifier(text)
+        self._assets[name] = (mtime, text, text.encode('utf-8'))
+        return self._assets[name]
+
+    def _entry(self, name):
+        entry = self._assets.get(name)
+        if entry and self.reload:
+            try:
+                if os.stat(self.path(name)).st_mtime != entry[0]:
+                    entry = None
+            except OSError:
+                pass
+        if not entry:
+            with self._lock:
+                entry = self._load(name)
+        return entry
+
+    def get(self, name):
+        """
+
+        :param name: file name relative to base_dir, e.g. 'print.css'
+        :return: text of the asset
+        """
+        return self._entry(name)[1]
+
+    def get_bytes(self, name):
+        """
+
+        :return: utf-8 bytes of the asset, cached next to the text
+        """
+        return self._entry(name)[2]
+
+    def preload(self, names=ASSET_NAMES):
+        """
+        load the assets now, e.g. at import time of the app before gunicorn forks
+
+        :param names: asset names
+        :return: self
+        """
+        for name in names:
+            self._entry(name)
+        return self
+
+
+registry = AssetRegistry()
+
+
+def get(name):
+    return registry.get(name)
+
+
+def get_bytes(name):
+    return registry.get_bytes(name)
+
+
+def preload(names=ASSET_NAMES):
+    return registry.preload(names)
@@ -0,0 +1,161 @@
+import asyncio
+import functools
+import re
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from bs4 import BeautifulSoup
+
+import dispatch
+import http_session
+import methods_file
+import retry_policy
+import rule_engine
+
+
+# hand written parsers that first discover the amp page of the article and then fetch it,
+# site_rules sites say so with Amp
+AMP_PARSERS = {'parse_wp_url_ampway'}
+AMP_FETCH_PROFILES = {'parse_wp_url_ampway': 'googlebot'}
+# hand written parsers that never fetch the url they are given as is (selenium, computed urls)
+NO_PREFETCH_PARSERS = {'parse_insights_daily_non_outline', 'parse_sapiens', 'parse_outline_url',
+                       'parse_wp_url_selenium'}
+
+
+def _amp_link_and_title(content):
+    soup_amp = BeautifulSoup(content, 'lxml')
+    title = re.sub(r'^\s+', '', soup_amp.title.text)
+    amp_link = soup_amp.find('link', {'rel': 'amphtml'})
+    if amp_link and amp_link.get('href'):
+        return amp_link['href'], title
+    return None, title
+
+
+class _PrefetchedMethods(methods_file.GetResourceMethods):
+    """
+    GetResourceMethods serving responses that were already awaited on the event loop,
+    anything missing goes through AsyncResourceMethods.fetch from the parser thread
+    """
+
+    def __init__(self, async_methods, loop):
+        super().__init__()
+        self.async_methods = async_methods
+        self.loop = loop
+        self.responses = {}
+        self.amp_urls = {}
+
+    def get_random_response(self, url, profile=None, stream=False):
+        response = self.responses.get(url)
+        if response is not None:
+            if response.status_code in retry_policy.RETRY_STATUSES:
+                # a retry has to fetch again instead of getting the same 503
+                del self.responses[url]
+            return self.remember_validators(url, retry_policy.check_response(response))
+        future = asyncio.run_coroutine_threadsafe(self.async_methods.fetch(url, profile=profile, stream=stream),
+                                                  self.loop)
+        return self.remember_validators(url, retry_policy.check_response(future.result()))
+
+    def get_amp_url_requests(self, non_amp_url):
+        if non_amp_url in self.amp_urls:
+            return self.amp_urls[non_amp_url]
+        return super().get_amp_url_requests(non_amp_url)
+
+
+class AsyncResourceMethods:
+    """
+    asyncio counterpart of GetResourceMethods.select_parser, network stages are awaited on an io
+    pool and the BeautifulSoup work of the parsers runs on a separate executor
+    """
+
+    def __init__(self, io_workers=16, parse_workers=4, parse_executor=None):
+        """
+
+        :param io_workers: threads doing the blocking pooled http calls
+        :param parse_workers: threads for the parsers, ignored if parse_executor is given
+        :param parse_executor: optional executor for the cpu bound parsing
+        """
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='async-fetch')
+        self.parse_executor = parse_executor or ThreadPoolExecutor(max_workers=parse_workers,
+                                                                   thread_name_prefix='async-parse')
+
+    async def fetch(self, url, profile=None, stream=False):
+        """
+
+        :param url: url to fetch through http_session
+        :param profile: header profile name
+        :param stream: leave the body unread for iter_content
+        :return: http response
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, functools.partial(http_session.get, url, profile=profile,
+                                                                              stream=stream))
+
+    async def fetch_many(self, url_list, profile=None):
+        """
+
+        :return: responses in the order of url_list, failed fetches come back as the exception
+        """
+        return await asyncio.gather(*(self.fetch(url, profile=profile) for url in url_list), return_exceptions=True)
+
+    async def get_amp_url(self, non_amp_url):
+        """
+        awaitable get_amp_url_requests
+
+        :return: amp_url, title and the response of the non amp page
+        """
+        response_amp = await self.fetch(non_amp_url)
+        if response_amp.status_code == 404:
+            return None, None, response_amp
+        loop = asyncio.get_running_loop()
+        amp_url, title = await loop.run_in_executor(self.parse_executor, _amp_link_and_title, response_amp.content)
+        return amp_url, title, response_amp
+
+    async def _prefetch_amp(self, method_object, url_full, profile):
+        amp_url, title, response = await self.get_amp_url(url_full)
+        method_object.responses[url_full] = response
+        if title:
+            method_object.amp_urls[url_full] = (amp_url, title)
+        if amp_url:
+            method_object.responses[amp_url] = await self.fetch(amp_url, profile=profile)
+
+    async def _prefetch(self, method_object, url_full):
+        # counted once, by method_object.select_parser
+        route = dispatch.route(url_full, count=False)
+        if route.Rule:
+            rule = rule_engine.COMPILED_RULES[route.Rule].Rule
+            # skipped and diverted urls are not fetched by the rule
+            handled = not rule_engine.skipped(rule, url_full) and not any(url_part in url_full
+                                                                          for url_part, _ in rule.Divert)
+            if handled and rule.Amp:
+                await self._prefetch_amp(method_object, url_full, rule.Profile)
+            elif handled:
+                fetch_url = rule_engine.fetch_url(rule, url_full)
+                method_object.responses[fetch_url] = await self.fetch(fetch_url, profile=rule.Profile)
+        else:
+            func_name = route.Parser
+            if func_name in AMP_PARSERS:
+                await self._prefetch_amp(method_object, url_full, AMP_FETCH_PROFILES.get(func_name))
+            elif func_name not in NO_PREFETCH_PARSERS:
+                method_object.responses[url_full] = await self.fetch(url_full)
+
+    async def select_parser(self, url_full, *, input_url_host_only=None):
+        """
+        same contract as GetResourceMethods.select_parser
+
+        :return: html string and title
+        """
+        if retry_policy.default_policy.is_open(url_full):
+            print(f'{urlparse(url_full).netloc} is failing, skipped {url_full}')
+            return None, None
+        loop = asyncio.get_running_loop()
+        method_object = _PrefetchedMethods(self, loop)
+        try:
+            await self._prefetch(method_object, url_full)
+        except Exception as e:
+            # not prefetched, the parser thread fetches it under the retry policy and its fallback
+            print(f'prefetch failed for {url_full}\n\terror is: {e.__class__} {e}')
+        return await loop.run_in_executor(self.parse_executor, method_object.select_parser, url_full)
+
+    def close(self):
+        self.io_executor.shutdown(wait=False)
+        self.parse_executor.shutdown(wait=False)
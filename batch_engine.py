@@ -0,0 +1,124 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import article_cache
+import dispatch
+import http_session
+import methods_file
+import rate_limiter
+import render_backend
+import retry_policy
+
+
+Batch_Result = namedtuple(typename='Batch_Result', field_names=['Url', 'Html', 'Title', 'List_Index', 'Error'])
+
+# max simultaneous fetches per host, anything not listed gets BatchCompiler.per_host_limit
+DEFAULT_HOST_LIMITS = {
+    'www.thehindu.com': 2,
+    'www.economist.com': 2,
+    'www.epw.in': 2,
+    'www.insightsonindia.com': 1,
+}
+
+
+class BatchCompiler:
+    """
+    fetches and parses a whole url list with a bounded worker pool fed by a rate_limiter.FairScheduler,
+    so hosts take turns within their rate and concurrency limits. results are filed with update_lists
+    in input order so the compiled pdf/epub sections stay deterministic
+    """
+
+    def __init__(self, method_object=None, max_workers=8, per_host_limit=3, host_limits=None):
+        """
+
+        :param method_object: GetResourceMethods used for select_parser and update_lists
+        :param max_workers: size of the worker pool
+        :param per_host_limit: concurrent fetches allowed per host by default
+        :param host_limits: dict of netloc -> limit, merged over DEFAULT_HOST_LIMITS
+        """
+        self.method_object = method_object or methods_file.GetResourceMethods()
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.host_limits = dict(DEFAULT_HOST_LIMITS, **(host_limits or {}))
+
+    def host_limit(self, netloc):
+        return self.host_limits.get(netloc, self.per_host_limit)
+
+    def parse_one(self, url, index):
+        """
+
+        :param url: article url
+        :param index: position of the url in the batch, becomes List_Index
+        :return: Batch_Result, Error is set instead of raising
+        """
+        try:
+            # articles prefetched by edition_crawler are assembled without fetching them again
+            cached = article_cache.default_cache.get(url)
+            if cached:
+                return Batch_Result(url, cached.Html, cached.Title, index, None)
+            html, title = self.method_object.select_parser(url)
+            return Batch_Result(url, html, title, index, None)
+        except Exception as e:
+            print(f'batch: failed {url}\n\terror is: {e.__class__} {e}')
+            return Batch_Result(url, None, None, index, e)
+
+    def _work(self, scheduler):
+        return [self.parse_one(url, index) for index, url in scheduler]
+
+    def run(self, url_list):
+        """
+
+        :param url_list: urls as returned by excel_return_urls
+        :return: list of Batch_Result in the same order as url_list
+        """
+        scheduler = rate_limiter.FairScheduler(enumerate(url_list), key=lambda item: urlparse(item[1]).netloc,
+                                               limiter=http_session.default_manager.limiter,
+                                               max_in_flight=self.host_limit)
+        results = [None] * len(url_list)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._work, scheduler) for _ in range(min(self.max_workers, len(url_list)))]
+            for future in futures:
+                for result in future.result():
+                    results[result.List_Index] = result
+        return results
+
+    def compile(self, url_list, store_article, compilation):
+        """
+        run the batch and file every parsed article into the sections of the run
+
+        :param url_list: urls as returned by excel_return_urls
+        :param store_article: callable(Batch_Result) -> (html_file_add, pdf_file_add), called in input order
+        :param compilation: compilation.Compilation owning the sections, e.g. `with Compilation() as run:`
+        :return: list of urls that were parsed and filed
+        """
+        done_urls = []
+        for result in self.run(url_list):
+            if result.Error or not result.Html or not result.Title:
+                continue
+            html_file_add, pdf_file_add = store_article(result)
+            self.method_object.update_lists(compilation, html_file_add, pdf_file_add, result.Url, result.Title,
+                                            result.List_Index)
+            done_urls.append(result.Url)
+        http_session.default_manager.print_stats()
+        retry_policy.print_stats()
+        dispatch.default_index.print_stats()
+        return done_urls
+
+
+def html_file_store(folder, render_pdf=render_backend.render_pdf):
+    """
+    store_article helper writing {index}.html into folder for the epub and keeping the rendered
+    pdf in memory for make_section_pdf
+
+    :param folder: working folder, e.g. the Indian_express_temp folder cleared by free_express_folder
+    :param render_pdf: callable(html_str) -> binary file object holding the pdf
+    :return: callable usable as BatchCompiler.compile store_article
+    """
+    def store_article(result):
+        html_path = os.path.join(folder, f'{result.List_Index}.html')
+        with open(html_path, 'w+', encoding='utf8') as html_write:
+            html_write.write(result.Html)
+        return html_path, render_pdf(result.Html)
+    return store_article
@@ -0,0 +1,79 @@
+"""
+assembling an article page with html += per part (and str.replace swapping placeholders for the inlined
+images into the finished string) against html_document.HtmlDocument joining the parts once
+
+usage: python benchmarks/bench_document.py [--paragraphs 400] [--images 12] [--image-kb 400] [--runs 10]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import image_cache  # noqa: E402
+from html_document import HtmlDocument  # noqa: E402
+
+
+def concat_build(title, paragraphs, image_urls, data_uris):
+    html = f'<html><head><meta charset="utf-8"><title>{title}</title>'
+    html += '<style></style></head><body>'
+    html += f"<h1><a href='https://example.com/a'>{title}</a></h1>"
+    every = max(len(paragraphs) // max(len(image_urls), 1), 1)
+    pending_images = []
+    for index, paragraph in enumerate(paragraphs):
+        html = html + paragraph
+        if index % every == 0 and len(pending_images) < len(image_urls):
+            html += f'<p><img src="{image_cache.placeholder(len(pending_images))}"/></p>'
+            pending_images.append(image_urls[len(pending_images)])
+    for index, url in enumerate(pending_images):
+        html = html.replace(image_cache.placeholder(index), data_uris.get(url, url))
+    html += '</body></html>'
+    return html
+
+
+def document_build(title, paragraphs, image_urls, data_uris):
+    document = HtmlDocument(title, '<style></style>')
+    document.add_header_link('https://example.com/a', title)
+    every = max(len(paragraphs) // max(len(image_urls), 1), 1)
+    for index, paragraph in enumerate(paragraphs):
+        document.add(paragraph)
+        if index % every == 0 and len(document.images) < len(image_urls):
+            document.add_image(image_urls[len(document.images)])
+    return document.render(data_uris)
+
+
+def measure(build, args, runs):
+    latencies = []
+    tracemalloc.start()
+    for _ in range(runs):
+        start = time.perf_counter()
+        html = build(*args)
+        latencies.append(time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sum(latencies) / len(latencies), peak, len(html)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--paragraphs', type=int, default=400)
+    parser.add_argument('--images', type=int, default=12)
+    parser.add_argument('--image-kb', type=int, default=400)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+    paragraphs = [f'<p>paragraph {index} ' + 'lorem ipsum dolor sit amet ' * 40 + '</p>'
+                  for index in range(args.paragraphs)]
+    image_urls = [f'https://example.com/{index}.jpg' for index in range(args.images)]
+    data_uris = {url: image_cache.to_data_uri(os.urandom(args.image_kb * 1024)) for url in image_urls}
+    build_args = ('Benchmark article', paragraphs, image_urls, data_uris)
+    assert concat_build(*build_args).replace("'", '"') == document_build(*build_args).replace("'", '"')
+    for name, build in (('concat', concat_build), ('html_document', document_build)):
+        avg, peak, size = measure(build, build_args, args.runs)
+        print(f'{name}: avg={avg * 1000:.2f}ms python_peak={peak / 1024 / 1024:.1f}MB '
+              f'page={size / 1024 / 1024:.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
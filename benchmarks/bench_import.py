@@ -0,0 +1,65 @@
+"""
+cold import time of the entry points from python -X importtime, and whether the heavy optional
+dependencies (selenium, openpyxl, ebooklib, PyPDF4, Pillow, ...) are loaded by the import alone
+
+usage: python benchmarks/bench_import.py [app methods_file job_queue ...] [--runs 5] [--top 10]
+exits with 1 if a module listed in DEFERRED is imported by one of the entry points
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# only imported inside the functions that use them
+DEFERRED = ('selenium', 'openpyxl', 'ebooklib', 'PyPDF4', 'PIL', 'pyquery', 'breadability')
+_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(module):
+    """
+
+    :param module: module name importable from the repo root
+    :return: dict of top level package -> cumulative microseconds, and the total for module
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode:
+        raise RuntimeError(f'import {module} failed:\n{result.stderr[-2000:]}')
+    packages, total = {}, 0
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if name == module and indent == 1:
+            total = cumulative
+        top = name.split('.')[0]
+        packages[top] = max(packages.get(top, 0), cumulative)
+    return packages, total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('modules', nargs='*', default=['app', 'methods_file', 'job_queue'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+    leaked = False
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.runs)]
+        totals = sorted(total for _, total in runs)
+        packages = runs[len(runs) // 2][0]
+        print(f'{module}: median={totals[len(totals) // 2] / 1000:.1f}ms min={totals[0] / 1000:.1f}ms')
+        for name, cumulative in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f'    {name:<24}{cumulative / 1000:8.1f}ms')
+        deferred = [name for name in DEFERRED if name in packages]
+        if deferred:
+            leaked = True
+            print(f'    loaded at import: {", ".join(deferred)}')
+    sys.exit(1 if leaked else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+outbound politeness against local stub http servers, one port per "host": requests a second each origin
+sees and total batch time for unthrottled fetching, the token buckets with the urls submitted in list
+order, and the token buckets with rate_limiter.FairScheduler handing out the urls
+
+usage: python benchmarks/bench_rate_limit.py [--hosts 3] [--urls 30 15 15] [--qps 5] [--burst 2]
+                                             [--workers 8] [--delay-ms 20]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_session  # noqa: E402
+import rate_limiter  # noqa: E402
+
+
+def stub_server(delay, arrivals):
+    """
+
+    :param delay: seconds every response takes
+    :param arrivals: list the arrival times of the requests are appended to
+    :return: started server, its port is server.server_address[1]
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            arrivals.append(time.monotonic())
+            time.sleep(delay)
+            body = b'<html><head><title>stub</title></head><body><p>ok</p></body></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def peak_rate(arrivals, window=1.0):
+    arrivals = sorted(arrivals)
+    peak, start = 0, 0
+    for end, arrival in enumerate(arrivals):
+        while arrival - arrivals[start] > window:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak / window
+
+
+def run_list_order(manager, urls, workers):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda url: manager.get(url).content, urls))
+
+
+def run_fair(manager, urls, workers):
+    scheduler = rate_limiter.FairScheduler(urls, key=lambda url: urlparse(url).netloc, limiter=manager.limiter)
+
+    def work():
+        for url in scheduler:
+            manager.get(url).content
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(work) for _ in range(workers)]:
+            future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=3)
+    parser.add_argument('--urls', type=int, nargs='+', default=[30, 15, 15], help='urls per host')
+    parser.add_argument('--qps', type=float, default=5)
+    parser.add_argument('--burst', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--delay-ms', type=float, default=20)
+    args = parser.parse_args()
+    counts = (args.urls + [args.urls[-1]] * args.hosts)[:args.hosts]
+    arrivals = [[] for _ in range(args.hosts)]
+    servers = [stub_server(args.delay_ms / 1000, arrivals[index]) for index in range(args.hosts)]
+    hosts = [f'127.0.0.1:{server.server_address[1]}' for server in servers]
+    # the busiest host first, the way an edition's url list usually comes
+    urls = [f'http://{host}/article/{number}' for host, count in zip(hosts, counts) for number in range(count)]
+    modes = (('unthrottled', None, run_list_order),
+             ('token bucket, list order', True, run_list_order),
+             ('token bucket, fair scheduler', True, run_fair))
+    for name, throttled, run in modes:
+        limiter = rate_limiter.HostRateLimiter(qps=args.qps, burst=args.burst) if throttled else None
+        manager = http_session.SessionManager(pool_maxsize=args.workers, limiter=limiter)
+        for host_arrivals in arrivals:
+            host_arrivals.clear()
+        start = time.perf_counter()
+        run(manager, urls, args.workers)
+        elapsed = time.perf_counter() - start
+        manager.close()
+        peaks = ' '.join(f'{peak_rate(host_arrivals):.0f}' for host_arrivals in arrivals)
+        print(f'{name}: {len(urls)} requests in {elapsed:.2f}s ({len(urls) / elapsed:.1f}/s), '
+              f'peak requests/s per host: {peaks}')
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+compare render backends on latency and memory
+
+usage: python benchmarks/bench_render.py article.html [article2.html ...] [--runs 5]
+run it from the repo root so print.css and papersize.js resolve, the html files can be saved
+select_parser output (e.g. the Indian_express_temp files).
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render_backend  # noqa: E402
+import renderer_pool  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+def max_rss_kb(who):
+    if not resource:
+        return 0
+    return resource.getrusage(who).ru_maxrss
+
+
+def bench(backend, html_list, runs):
+    latencies = []
+    sizes = []
+    tracemalloc.start()
+    for _ in range(runs):
+        for html_str in html_list:
+            out = io.BytesIO()
+            start = time.perf_counter()
+            backend.render(html_str, out)
+            latencies.append(time.perf_counter() - start)
+            sizes.append(out.tell())
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {'renders': len(latencies), 'avg_s': sum(latencies) / len(latencies),
+            'p95_s': latencies[int(len(latencies) * 0.95)], 'avg_pdf_kb': sum(sizes) / len(sizes) / 1024,
+            'python_peak_kb': python_peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('html_files', nargs='+')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--backends', default='phantomjs,weasyprint')
+    args = parser.parse_args()
+    html_list = []
+    for path in args.html_files:
+        with open(path, encoding='utf8') as html_read:
+            html_list.append(html_read.read())
+    for name in args.backends.split(','):
+        backend = render_backend.BACKENDS[name]
+        # warm up, phantomjs pays its process start here and weasyprint its font setup
+        backend.render(html_list[0], io.BytesIO())
+        self_rss = max_rss_kb(resource.RUSAGE_SELF) if resource else 0
+        child_rss = max_rss_kb(resource.RUSAGE_CHILDREN) if resource else 0
+        result = bench(backend, html_list, args.runs)
+        # quitting the pooled drivers reaps phantomjs so its peak shows up in RUSAGE_CHILDREN
+        renderer_pool.close_all()
+        if resource:
+            result['max_rss_self_kb'] = max(max_rss_kb(resource.RUSAGE_SELF), self_rss)
+            result['max_rss_children_kb'] = max(max_rss_kb(resource.RUSAGE_CHILDREN), child_rss)
+        print(name, ' '.join(f'{key}={value:.3f}' if isinstance(value, float) else f'{key}={value}'
+                             for key, value in result.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+per article parse time of the BeautifulSoup steps the hand written parse_* methods used against
+rule_engine.extract, both driven by the same site rule and fed the same saved page so only parsing
+is measured
+
+usage: python benchmarks/bench_rules.py RULE_NAME page.html [page2.html ...] [--runs 20]
+save the pages the rule fetches (the amp page for Amp rules, the mercury page for the mercury rule).
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rule_engine  # noqa: E402
+
+
+def soup_extract(rule, content, input_url, stylesheet=''):
+    """
+    what every parse_* method did before the rule engine: full BeautifulSoup tree, decompose the
+    unwanted tags, rewrite the headline with new_tag and concatenate the strings
+    """
+    soup = BeautifulSoup(content, 'lxml')
+    title = re.sub(r'^\s+', '', soup.title.text)
+    html = f'<html><head><meta charset="utf-8"><title>{title}</title>{stylesheet}'
+    if rule.Keep_Styles:
+        for item in soup.find_all('style'):
+            html += str(item)
+    html += '</head><body>'
+    if rule.Drop:
+        for unwanted in soup.select(rule.Drop):
+            unwanted.decompose()
+    header_tag = soup.select_one(rule.Header) if rule.Header else None
+    if header_tag:
+        new_header_tag = soup.new_tag("a", href=f'{input_url}')
+        new_header_tag.string = f'{header_tag.text}'
+        header_tag.string = ''
+        header_tag.append(new_header_tag)
+    for article in soup.select(rule.Container):
+        if rule.Only:
+            for item in article.select(rule.Only):
+                html += str(item)
+        else:
+            html += str(article)
+    html += '</body></html>'
+    return html, title
+
+
+def timed(func, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return sum(latencies) / len(latencies), latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('rule', choices=sorted(rule_engine.COMPILED_RULES))
+    parser.add_argument('html_files', nargs='+')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    compiled = rule_engine.COMPILED_RULES[args.rule]
+    for path in args.html_files:
+        with open(path, 'rb') as page:
+            content = page.read()
+        url = f'https://example.com/{os.path.basename(path)}'
+        before_avg, before_p95 = timed(lambda: soup_extract(compiled.Rule, content, url), args.runs)
+        after_avg, after_p95 = timed(lambda: rule_engine.extract(compiled, content, url), args.runs)
+        print(f'{path} {len(content) / 1024:.0f}kB  beautifulsoup avg={before_avg * 1000:.2f}ms '
+              f'p95={before_p95 * 1000:.2f}ms  rule_engine avg={after_avg * 1000:.2f}ms '
+              f'p95={after_p95 * 1000:.2f}ms  speedup={before_avg / after_avg:.1f}x')
+        if compiled.Cleaner:
+            # force the streaming cleaner whatever the page size
+            stream_min_bytes, rule_engine.STREAM_MIN_BYTES = rule_engine.STREAM_MIN_BYTES, 0
+            stream_avg, stream_p95 = timed(lambda: rule_engine.extract(compiled, content, url), args.runs)
+            rule_engine.STREAM_MIN_BYTES = stream_min_bytes
+            print(f'{path} streaming cleaner avg={stream_avg * 1000:.2f}ms p95={stream_p95 * 1000:.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+update_economist_epw style matching of compiled urls against an archive: SequenceMatcher on every pair
+against similarity_index.SimilarityIndex, and a check that both remove the same archived urls. some of the
+compiled urls have their slug separators dropped or moved, which share few character n-grams with the
+archived url while their ratio stays high
+
+usage: python benchmarks/bench_similarity.py [--archive 3000] [--done 30] [--threshold 0.85] [--seed 1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import similarity_index  # noqa: E402
+
+SECTIONS = ['leaders', 'briefing', 'asia', 'china', 'international', 'business', 'finance-and-economics',
+            'science-and-technology', 'books-and-arts', 'united-states', 'europe', 'britain']
+SYLLABLES = ('ba be bi bo bu ca ce ci co da de di do fa fe fi ga ge go ha he hi la le li lo ma me mi mo na ne ni '
+             'no pa pe pi po ra re ri ro sa se si so ta te ti to va ve vi wa we ya yo za ze').split()
+
+
+def vocabulary(size, rng):
+    return [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(size)]
+
+
+def archive_urls(count, rng, words):
+    urls = []
+    for index in range(count):
+        day = f'2020/{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}'
+        slug = '-'.join(rng.choice(words) for _ in range(rng.randint(3, 8)))
+        urls.append(f'https://www.economist.com/{rng.choice(SECTIONS)}/{day}/{slug}-{index}')
+    return urls
+
+
+def reseparate(url, rng):
+    """
+
+    :return: url with the dashes of its slug removed, or put every 2 to 4 characters instead
+    """
+    head, _, slug = url.rpartition('/')
+    letters = slug.replace('-', '')
+    if rng.random() < 0.5:
+        return f'{head}/{letters}'
+    parts, start = [], 0
+    while start < len(letters):
+        step = rng.randint(2, 4)
+        parts.append(letters[start:start + step])
+        start += step
+    return f'{head}/{"-".join(parts)}'
+
+
+def done_urls(archive, count, rng, words):
+    """
+    what the excel sheet holds: archived urls with tracking queries, http, percent encoding, moved
+    separators, plus some articles from elsewhere
+    """
+    urls = []
+    for index in range(count):
+        url = rng.choice(archive)
+        variant = index % 5
+        if variant == 1:
+            url += '?fsrc=scn/tw/te/bl/ed/'
+        elif variant == 2:
+            url = url.replace('https://www.', 'http://').replace('-', '%2D', 1)
+        elif variant == 3:
+            url = reseparate(url, rng)
+        elif variant == 4:
+            url = f'https://www.thehindu.com/opinion/lead/{rng.choice(words)}-{rng.choice(words)}/article{index}.ece'
+        urls.append(url)
+    return urls
+
+
+def brute_force(archive, done, threshold):
+    keys = [(url, similarity_index.normalize_url(url)) for url in archive]
+    removed = set()
+    for url in done:
+        query = similarity_index.normalize_url(url)
+        for archived, key in keys:
+            if archived not in removed and SequenceMatcher(None, key, query, autojunk=False).ratio() >= threshold:
+                removed.add(archived)
+    return removed
+
+
+def indexed(archive, done, threshold):
+    index = similarity_index.SimilarityIndex(archive)
+    removed = set()
+    for url in done:
+        removed.update(index.discard_similar(url, threshold))
+    return removed
+
+
+def separator_case():
+    """
+    a slug whose separators break every character n-gram, ratio 0.857 against the query
+    """
+    index = similarity_index.SimilarityIndex(['abc-def-ghi-jkl-mno-pqr-stu-vwx-yz0-123-456-789-'],
+                                             normalize=similarity_index.normalize_text)
+    return index.best('abcdefghijklmnopqrstuvwxyz0123456789', 0.85) is not None
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--archive', type=int, default=3000)
+    parser.add_argument('--done', type=int, default=30)
+    parser.add_argument('--threshold', type=float, default=0.85)
+    parser.add_argument('--words', type=int, default=2000, help='size of the made up slug vocabulary')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    words = vocabulary(args.words, rng)
+    archive = archive_urls(args.archive, rng, words)
+    done = done_urls(archive, args.done, rng, words)
+    expected, brute_time = timed(brute_force, archive, done, args.threshold)
+    found, index_time = timed(indexed, archive, done, args.threshold)
+    build_time = timed(similarity_index.SimilarityIndex, archive)[1]
+    print(f'{len(done)} urls against {len(archive)} archived: brute force {brute_time * 1000:.1f}ms, '
+          f'index {index_time * 1000:.1f}ms (build {build_time * 1000:.1f}ms), '
+          f'{len(expected)} removed, missed {len(expected - found)}, extra {len(found - expected)}')
+    separators_found = separator_case()
+    print(f'inserted separator case {"found" if separators_found else "missed"}')
+    sys.exit(1 if found != expected or not separators_found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+class Item_Entry:
+    """
+    one compiled article, was a namedtuple: same fields, no per instance dict
+    """
+    __slots__ = ('HTML_Address', 'Pdf_Address', 'Article_Title', 'List_Index')
+
+    def __init__(self, HTML_Address, Pdf_Address, Article_Title, List_Index):
+        self.HTML_Address = HTML_Address
+        self.Pdf_Address = Pdf_Address
+        self.Article_Title = Article_Title
+        self.List_Index = List_Index
+
+    def close(self):
+        # the pdf is a path or, from batch_engine.html_file_store, an in-memory buffer
+        if hasattr(self.Pdf_Address, 'close'):
+            self.Pdf_Address.close()
+        self.Pdf_Address = None
+
+
+class Section:
+    """
+    articles of one chapter of the pdf and epub, with the epub chapters made from them
+    """
+    __slots__ = ('name', 'pdf_tag', 'toc_title', 'heading', 'entries', 'chapters')
+
+    def __init__(self, name, pdf_tag, toc_title, heading):
+        """
+
+        :param name: key used by update_lists
+        :param pdf_tag: top level bookmark of the section in the pdf
+        :param toc_title: section title in the epub table of contents
+        :param heading: suffix of the epub chapter file names
+        """
+        self.name = name
+        self.pdf_tag = pdf_tag
+        self.toc_title = toc_title
+        self.heading = heading
+        self.entries = []
+        self.chapters = []
+
+
+# (name, pdf bookmark, epub toc title, epub file name suffix) in the order of the compiled book
+SECTIONS = (
+    ('opinion', 'Chapter 1: Opinion_Articles', 'Opinion', 'opinion'),
+    ('explained', 'Chapter 2: Explained_Articles', 'Explained', 'explained'),
+    ('other', 'Chapter 3: Other_Articles', 'Other', 'other'),
+    ('economist', 'Chapter 4: Economist and EPW', 'Economist and EPW', 'economist_epw'),
+)
+
+
+class Compilation:
+    """
+    state of one daily compilation run: the section lists and the epub book. used to be class
+    attributes of GetResourceMethods shared by every instance and never emptied, now each run owns
+    its own and close() (or leaving the with block) releases the entries, pdf buffers and book
+    """
+    __slots__ = ('sections', '_by_name', '_book')
+
+    def __init__(self, sections=SECTIONS):
+        """
+
+        :param sections: iterable of (name, pdf_tag, toc_title, heading), see SECTIONS
+        """
+        self.sections = [Section(*section) for section in sections]
+        self._by_name = {section.name: section for section in self.sections}
+        self._book = None
+
+    def section(self, name):
+        return self._by_name[name]
+
+    def add(self, name, entry):
+        """
+
+        :param name: section name, e.g. 'opinion'
+        :param entry: Item_Entry
+        """
+        self._by_name[name].entries.append(entry)
+        return entry
+
+    def __len__(self):
+        return sum(len(section.entries) for section in self.sections)
+
+    @property
+    def book(self):
+        """
+        the epub book, created on first use so runs making only the pdf never load ebooklib
+        """
+        if self._book is None:
+            from ebooklib import epub
+            self._book = epub.EpubBook()
+        return self._book
+
+    def close(self):
+        for section in self.sections:
+            for entry in section.entries:
+                entry.close()
+            section.entries.clear()
+            section.chapters.clear()
+        self._book = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
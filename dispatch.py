@@ -0,0 +1,154 @@
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse
+
+import rule_engine
+
+
+# hand written parsers: host key -> GetResourceMethods method name. keys are written like site_rules
+# Hosts, 'scheme://netloc/' optionally followed by a path prefix ('https://www.livemint.com/opinion/')
+PARSER_HOSTS = {
+    'https://www.washingtonpost.com/': 'parse_wp_url_ampway',
+    'https://www.epw.in/': 'parse_epw_non_outline',
+    'https://www.sapiens.org/': 'parse_sapiens',
+    'https://www.insightsonindia.com/': 'parse_insights_daily_non_outline',
+    'http://www.thepeoplehistory.com/': 'parse_history_articles',
+    'https://www.indianage.com/': 'parse_history_articles',
+    'https://medium.com/': 'parse_outline_url',
+}
+FALLBACK_PARSER = 'parse_other'
+# subdomains serving the same articles as the site itself
+EQUIVALENT_SUBDOMAINS = frozenset(['www', 'm', 'amp', 'mobile'])
+# public suffixes of two labels, enough of the public suffix list for the sites compiled here
+MULTI_LABEL_SUFFIXES = frozenset(['co.in', 'org.in', 'net.in', 'gov.in', 'ac.in', 'co.uk', 'org.uk', 'com.au',
+                                  'com.cn', 'com.hk', 'com.tw', 'com.pk', 'co.jp'])
+
+# Parser: GetResourceMethods method, Rule: site_rules name served by parse_with_rule or None,
+# Key: host key of the route, Match: 'host', 'domain' (matched on the registered domain) or None (fallback)
+Route = namedtuple(typename='Route', field_names=['Parser', 'Rule', 'Key', 'Match'])
+
+
+def registered_domain(host):
+    """
+
+    :param host: lower case host name without port
+    :return: eTLD+1, e.g. 'thehindu.com' for 'epaper.thehindu.com', 'bbc.co.uk' for 'www.bbc.co.uk'
+    """
+    labels = host.split('.')
+    size = 3 if len(labels) > 2 and '.'.join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 2
+    return '.'.join(labels[-size:])
+
+
+def normalize_host(netloc):
+    """
+
+    :param netloc: netloc of a url, may hold credentials, a port, upper case or a trailing dot
+    :return: host name with the EQUIVALENT_SUBDOMAINS prefixes removed, 'm.thehindu.com:443' -> 'thehindu.com'
+    """
+    host = netloc.rpartition('@')[2].split(':')[0].rstrip('.').lower()
+    domain = registered_domain(host)
+    while host != domain and host.split('.', 1)[0] in EQUIVALENT_SUBDOMAINS:
+        host = host.split('.', 1)[1]
+    return host
+
+
+class DispatchIndex:
+    """
+    url -> parser routing built once per process: hosts are normalized (scheme, port, www/m/amp
+    subdomains) before the lookup, unknown subdomains fall back to their registered domain when it
+    belongs to a single site, and the longest matching path prefix wins. counts what was routed where
+    """
+
+    def __init__(self, rule_hosts=None, parser_hosts=None):
+        """
+
+        :param rule_hosts: dict of host key -> site_rules rule name, from rule_engine.COMPILED_RULES if None
+        :param parser_hosts: dict of host key -> method name, PARSER_HOSTS if None
+        """
+        if rule_hosts is None:
+            rule_hosts = {host: name for name, compiled in rule_engine.COMPILED_RULES.items()
+                          for host in compiled.Rule.Hosts}
+        routes = [(key, Route('parse_with_rule', name, key, 'host')) for key, name in rule_hosts.items()]
+        routes += [(key, Route(method, None, key, 'host'))
+                   for key, method in (PARSER_HOSTS if parser_hosts is None else parser_hosts).items()]
+        self._hosts = {}
+        for key, route in routes:
+            parsed_key = urlparse(key)
+            self._hosts.setdefault(normalize_host(parsed_key.netloc), []).append((parsed_key.path or '/', route))
+        for entries in self._hosts.values():
+            entries.sort(key=lambda entry: -len(entry[0]))
+        sites = {}
+        for host in self._hosts:
+            sites.setdefault(registered_domain(host), []).append(host)
+        self._domains = {domain: [(prefix, route._replace(Match='domain')) for prefix, route in self._hosts[hosts[0]]]
+                         for domain, hosts in sites.items() if len(hosts) == 1}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _count(self, kind, name):
+        with self._lock:
+            counts = self._counts.setdefault(kind, {})
+            counts[name] = counts.get(name, 0) + 1
+
+    def route(self, url, count=True):
+        """
+
+        :param url: article url
+        :param count: add the lookup to the counters
+        :return: Route, Parser is FALLBACK_PARSER with Match None when nothing matches
+        """
+        parsed_uri = urlparse(url)
+        host = normalize_host(parsed_uri.netloc)
+        entries = self._hosts.get(host) or self._domains.get(registered_domain(host), ())
+        path = parsed_uri.path or '/'
+        for prefix, route in entries:
+            if path.startswith(prefix):
+                if count:
+                    self._count('hits', route.Key)
+                    if route.Match == 'domain':
+                        self._count('domain_hits', host)
+                return route
+        if count:
+            self._count('no_route', host)
+        return Route(FALLBACK_PARSER, None, None, None)
+
+    def parser_failed(self, route, url, error):
+        """
+        record a routed parser raising, the caller falls back to FALLBACK_PARSER
+
+        :param route: Route the url went to
+        :param url: article url
+        :param error: the exception
+        """
+        self._count('parser_errors', route.Rule or route.Parser)
+        print(f'{route.Rule or route.Parser} failed for {url}, falling back to {FALLBACK_PARSER}'
+              f'\n\terror is: {error.__class__} {error}')
+
+    def stats(self):
+        """
+
+        :return: dict of 'hits' (host key), 'domain_hits' and 'no_route' (host), 'parser_errors' (parser)
+                 -> count
+        """
+        with self._lock:
+            return {kind: dict(counts) for kind, counts in self._counts.items()}
+
+    def print_stats(self):
+        stats = self.stats()
+        hits, fallbacks = sum(stats.get('hits', {}).values()), sum(stats.get('no_route', {}).values())
+        errors = sum(stats.get('parser_errors', {}).values())
+        print(f'dispatch: {hits} routed, {fallbacks} without a parser, {errors} parser errors fell back')
+        for kind in ('no_route', 'parser_errors', 'domain_hits'):
+            for name, number in sorted(stats.get(kind, {}).items(), key=lambda item: -item[1]):
+                print(f'    {kind} {name}: {number}')
+
+
+default_index = DispatchIndex()
+
+
+def route(url, count=True):
+    return default_index.route(url, count=count)
+
+
+def stats():
+    return default_index.stats()
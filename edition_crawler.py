@@ -0,0 +1,220 @@
+import argparse
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bs4 import BeautifulSoup
+
+import http_session
+import retry_policy
+import state_store
+
+
+# paths of edition links that are not articles
+EPW_SKIP = ('/engage/', '/appointmentsprogrammesannouncements/', '/current-statistics/', '/author/')
+ECONOMIST_SKIP = ('graphic-detail/', 'economic-and-financial-indicators/')
+PREFETCH_WORKERS = 4
+
+# Status: http status of the edition fetch, 304 when it did not change, Articles: article links on the
+# page, New: the ones not seen before, added to the candidates
+Crawl_Result = namedtuple(typename='Crawl_Result', field_names=['Source', 'Url', 'Status', 'Articles', 'New'])
+
+
+def epw_edition_url(day=None):
+    """
+    the journal issue of the week before day. the previous week is taken from the date, so in the first
+    ISO week of a year it is the last week of the year before
+
+    :param day: datetime, now if None
+    :return: edition index url
+    """
+    year, week, _ = ((day or datetime.now()) - timedelta(weeks=1)).isocalendar()
+    return f'https://www.epw.in/journal/{year}/{week}'
+
+
+def economist_edition_url(day=None):
+    """
+
+    :param day: datetime, now if None, the edition is dated the day after
+    :return: edition index url
+    """
+    print_edition_date = (day or datetime.now()) + timedelta(days=1)
+    return 'https://www.economist.com/weeklyedition/' + print_edition_date.strftime('%Y-%m-%d')
+
+
+def epw_articles(content):
+    """
+
+    :param content: html of an epw journal issue
+    :return: article urls in page order without duplicates, empty if the issue has no article list
+    """
+    epw_soup = BeautifulSoup(content, 'lxml')
+    epw_article_list_wrapper = epw_soup.find('div', {'id': 'block-system-main'})
+    if epw_article_list_wrapper is None:
+        return []
+    for trunc in epw_article_list_wrapper(['h3']):
+        trunc.decompose()
+    return list(dict.fromkeys(f"https://www.epw.in{trunc['href']}" for trunc in epw_article_list_wrapper(['a'])
+                              if trunc.get('href') and not any(item in trunc['href'] for item in EPW_SKIP)))
+
+
+def economist_articles(content):
+    """
+
+    :param content: html of an economist weekly edition
+    :return: article urls in page order without duplicates, empty if the page has no edition
+    """
+    soup_economist = BeautifulSoup(content, 'lxml')
+    current_edition = soup_economist.find('div', {'class': 'layout-weekly-edition'})
+    if current_edition is None:
+        return []
+    return list(dict.fromkeys(f"https://www.economist.com{item['href']}" for item in current_edition(['a'])[2:]
+                              if item.get('href') and not any(skip in item['href'] for skip in ECONOMIST_SKIP)))
+
+
+# source -> (edition url for a day, article links of an edition page, header profile)
+SOURCES = {
+    'epw': (epw_edition_url, epw_articles, 'googlebot'),
+    'economist': (economist_edition_url, economist_articles, None),
+}
+
+
+class EditionCrawler:
+    """
+    keeps the economist and epw candidate lists up to date one edition at a time: the index page is
+    fetched with the validators of the last crawl so an unchanged edition costs a 304, and only
+    articles never seen before are added, instead of rebuilding the list from the page every time
+    """
+
+    def __init__(self, store=None, sources=None):
+        """
+
+        :param store: state_store.StateStore, state_store.default_store if None
+        :param sources: dict like SOURCES, merged over it
+        """
+        self.store = store or state_store.default_store
+        self.sources = dict(SOURCES, **(sources or {}))
+
+    @staticmethod
+    def _fetch(url, profile, headers):
+        return retry_policy.check_response(http_session.get(url, profile=profile, headers=headers))
+
+    def crawl(self, source, edition_url=None, force=False):
+        """
+
+        :param source: key of SOURCES
+        :param edition_url: index page, this week's edition if None
+        :param force: fetch without the stored validators, e.g. after the candidates were emptied by hand
+        :return: Crawl_Result
+        """
+        url_for, extract, profile = self.sources[source]
+        edition_url = edition_url or url_for()
+        edition = None if force else self.store.edition(edition_url)
+        headers = {}
+        if edition and edition.Etag:
+            headers['If-None-Match'] = edition.Etag
+        if edition and edition.Last_Modified:
+            headers['If-Modified-Since'] = edition.Last_Modified
+        response = retry_policy.default_policy.call(self._fetch, edition_url, edition_url, profile, headers)
+        if response.status_code == 304:
+            self.store.touch_edition(edition_url)
+            print(f'{source}: {edition_url} unchanged')
+            return Crawl_Result(source, edition_url, 304, [], [])
+        if response.status_code != 200:
+            print(f'{source}: {edition_url} answered {response.status_code}')
+            return Crawl_Result(source, edition_url, response.status_code, [], [])
+        articles = extract(response.content)
+        new = self.store.unseen(source, articles)
+        done = self.store.done_urls(new)
+        new = [url for url in new if url not in done]
+        self.store.append(source, 'candidate', new)
+        self.store.append(source, 'seen', articles)
+        if articles:
+            # an edition without articles is not finished yet, keep fetching it in full
+            self.store.save_edition(source, edition_url, response.headers.get('ETag'),
+                                    response.headers.get('Last-Modified'), len(articles))
+        print(f'{source}: {edition_url} has {len(articles)} articles, {len(new)} new')
+        return Crawl_Result(source, edition_url, response.status_code, articles, new)
+
+    def crawl_all(self, force=False):
+        """
+
+        :return: list of Crawl_Result, one per source, a failing source does not stop the others
+        """
+        results = []
+        for source in self.sources:
+            try:
+                results.append(self.crawl(source, force=force))
+            except Exception as e:
+                print(f'{source}: crawl failed\n\terror is: {e.__class__} {e}')
+        return results
+
+
+def prefetch(url_list, workers=PREFETCH_WORKERS, render=False, renderer=None):
+    """
+    scrape articles into the article cache so the morning compile only assembles cached content
+
+    :param url_list: article urls, cached ones are not fetched again
+    :param render: render the pdf too, what /get_pdf serves
+    :param renderer: render_backend name used when render is set
+    :return: number of articles now in the cache (with their pdf when render is set)
+    """
+    import article_pipeline
+
+    def fetch(url):
+        try:
+            if not render:
+                html_str, title_txt = article_pipeline.article_html(url)
+                return bool(html_str and title_txt)
+            pdf_file, title_txt = article_pipeline.article_pdf(url, renderer=renderer)
+            if pdf_file is not None and not isinstance(pdf_file, str):
+                # the cache could not keep it, nothing is warmed
+                pdf_file.close()
+            return isinstance(pdf_file, str)
+        except Exception as e:
+            print(f'prefetch: failed {url}\n\terror is: {e.__class__} {e}')
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        cached = sum(executor.map(fetch, url_list))
+    print(f'prefetch: {cached} of {len(url_list)} articles cached{" and rendered" if render else ""}')
+    return cached
+
+
+def prefetch_in_background(url_list, workers=PREFETCH_WORKERS):
+    """
+
+    :return: the started daemon thread running prefetch, join it to wait
+    """
+    thread = threading.Thread(target=prefetch, args=(list(url_list), workers), daemon=True)
+    thread.start()
+    return thread
+
+
+default_crawler = EditionCrawler()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='add new economist/epw edition articles to the candidates')
+    parser.add_argument('sources', nargs='*', help=f'any of {", ".join(SOURCES)}, all if none given')
+    parser.add_argument('--url', help='edition index url instead of the current one, needs a single source')
+    parser.add_argument('--force', action='store_true', help='ignore the stored validators')
+    parser.add_argument('--prefetch', action='store_true', help='scrape the new articles into the article cache')
+    parser.add_argument('--workers', type=int, default=PREFETCH_WORKERS)
+    args = parser.parse_args()
+    unknown = [source for source in args.sources if source not in SOURCES]
+    if unknown:
+        parser.error(f'unknown sources {unknown}')
+    if args.url and len(args.sources) != 1:
+        parser.error('--url needs exactly one source')
+    if args.sources:
+        results = [default_crawler.crawl(source, args.url, force=args.force) for source in args.sources]
+    else:
+        results = default_crawler.crawl_all(force=args.force)
+    if args.prefetch:
+        prefetch([url for result in results for url in result.New], workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+import codecs
+import copy
+import re
+from collections import namedtuple
+
+from bs4.dammit import EncodingDetector
+from lxml import etree
+
+
+CHUNK_SIZE = 64 * 1024
+
+# tag, classes, id and attribute tests of one compound selector like div.story[id^="x"]
+Compound = namedtuple(typename='Compound', field_names=['Tag', 'Classes', 'Id', 'Attrs'])
+
+# lxml refuses str input carrying one
+_XML_DECLARATION = re.compile(r'^\s*<\?xml[^>]*\?>')
+_COMPOUND = re.compile(r'(?P<tag>[a-zA-Z][\w-]*|\*)?(?P<rest>(?:\.[\w-]+|#[\w-]+|\[[^\]]+\])*)$')
+_PART = re.compile(r'\.([\w-]+)|#([\w-]+)|\[\s*([\w-]+)\s*(?:([\^*]?=)\s*(?:"([^"]*)"|\'([^\']*)\'|([\w-]+)))?\s*\]')
+
+
+def parse_selector(css):
+    """
+    parse the css subset the cleaner can match while streaming: tag, .class, #id, [attr], [attr="v"],
+    [attr^="v"], [attr*="v"], compounds of those and descendant combinators, comma separated
+
+    :param css: selector group
+    :return: list of alternatives, each a list of Compound from the outermost ancestor to the element
+    :raises ValueError: for anything else (child/sibling combinators, pseudo classes)
+    """
+    alternatives = []
+    for selector in css.split(','):
+        # quoted attribute values may hold spaces, split on whitespace outside brackets only
+        compounds = []
+        for text in re.findall(r'(?:\[[^\]]*\]|[^\s\[])+', selector):
+            match = _COMPOUND.match(text)
+            if not match or not text:
+                raise ValueError(f'not a streaming selector: {selector.strip()!r}')
+            classes, element_id, attrs = set(), None, []
+            for part in _PART.finditer(match.group('rest')):
+                cls, id_, attr, operator, *values = part.groups()
+                if cls:
+                    classes.add(cls)
+                elif id_:
+                    element_id = id_
+                else:
+                    value = next((v for v in values if v is not None), None)
+                    attrs.append((attr, operator, value))
+            tag = match.group('tag')
+            compounds.append(Compound(None if tag in (None, '*') else tag.lower(), frozenset(classes), element_id,
+                                      tuple(attrs)))
+        if not compounds:
+            raise ValueError(f'empty selector in {css!r}')
+        alternatives.append(compounds)
+    return alternatives
+
+
+def _matches_compound(element, compound, classes):
+    if compound.Tag and element.tag != compound.Tag:
+        return False
+    if compound.Classes and not compound.Classes <= classes:
+        return False
+    if compound.Id and element.get('id') != compound.Id:
+        return False
+    for attr, operator, value in compound.Attrs:
+        actual = element.get(attr)
+        if actual is None:
+            return False
+        if operator == '=' and actual != value:
+            return False
+        if operator == '^=' and not actual.startswith(value):
+            return False
+        if operator == '*=' and value not in actual:
+            return False
+    return True
+
+
+def _class_set(element):
+    cls = element.get('class')
+    return set(cls.split()) if cls else set()
+
+
+class Matcher:
+    """
+    selector group compiled for one check per element, alternatives are bucketed by the id, a class
+    or the tag they require so an element is only tested against the ones that can match it
+    """
+
+    def __init__(self, css):
+        self.css = css
+        self._by_id, self._by_class, self._by_tag, self._other = {}, {}, {}, []
+        for compounds in parse_selector(css):
+            last = compounds[-1]
+            if last.Id:
+                self._by_id.setdefault(last.Id, []).append(compounds)
+            elif last.Classes:
+                self._by_class.setdefault(next(iter(last.Classes)), []).append(compounds)
+            elif last.Tag:
+                self._by_tag.setdefault(last.Tag, []).append(compounds)
+            else:
+                self._other.append(compounds)
+
+    def __call__(self, element, classes=None):
+        """
+
+        :param element: lxml element whose ancestors are already parsed
+        :param classes: set of the element's classes when the caller has it already
+        :return: True if any alternative matches
+        """
+        if classes is None:
+            classes = _class_set(element)
+        for compounds in self._candidates(element, classes):
+            if not _matches_compound(element, compounds[-1], classes):
+                continue
+            pending = len(compounds) - 2
+            for ancestor in element.iterancestors():
+                if pending < 0:
+                    break
+                if _matches_compound(ancestor, compounds[pending], _class_set(ancestor)):
+                    pending -= 1
+            if pending < 0:
+                return True
+        return False
+
+    def _candidates(self, element, classes):
+        yield from self._by_tag.get(element.tag, ())
+        yield from self._other
+        if self._by_id:
+            yield from self._by_id.get(element.get('id'), ())
+        if self._by_class:
+            for cls in classes:
+                yield from self._by_class.get(cls, ())
+
+
+def matcher(css):
+    return Matcher(css) if css else None
+
+
+def _serialize(element):
+    return etree.tostring(element, encoding='unicode', method='html', with_tail=False)
+
+
+def _remove(element):
+    """
+    drop an element keeping its tail text, like BeautifulSoup decompose leaves the following string
+    """
+    parent = element.getparent()
+    if parent is None:
+        return
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or '') + element.tail
+        else:
+            parent.text = (parent.text or '') + element.tail
+    parent.remove(element)
+
+
+class StreamCleaner:
+    """
+    one pass over a page with lxml's pull parser: unwanted elements are removed as soon as they close,
+    container content is serialized and freed as it completes and everything outside the containers
+    is discarded, so only the open path of the document is held in memory
+    """
+
+    def __init__(self, container, drop=None, only=None, capture=None, rewrite=None):
+        """
+
+        :param container: css selector group (see parse_selector), every non nested match is emitted
+        :param drop: css selector group removed wherever it occurs
+        :param only: css selector, emit just these descendants of the containers instead of the containers
+        :param capture: dict of name -> css selector, the first match outside a dropped element is kept
+                        (e.g. title, headline) and returned with the cleaned parts
+        :param rewrite: callable(element, captured) run when an element inside a container closes, return
+                        False to drop it, may change the element in place
+        """
+        self.container = Matcher(container)
+        self.drop = matcher(drop)
+        self.only = matcher(only)
+        self.capture = {name: Matcher(css) for name, css in (capture or {}).items()}
+        self.rewrite = rewrite
+
+    def clean(self, chunks, captured=None):
+        """
+
+        :param chunks: iterable of html str, e.g. iter_decoded(response, response.iter_content(CHUNK_SIZE)).
+                       bytes are decoded by lxml, as latin-1 unless the page declares a charset
+        :param captured: dict filled with the elements named in capture as they close
+        :return: generator of serialized container html strings in document order
+        """
+        captured = {} if captured is None else captured
+        parser = etree.HTMLPullParser(events=('start', 'end'))
+        state = _State(self.capture)
+        for chunk in chunks:
+            parser.feed(chunk)
+            yield from self._drain(parser, state, captured)
+        parser.close()
+        yield from self._drain(parser, state, captured)
+
+    def _drain(self, parser, state, captured):
+        drop, container, only, rewrite = self.drop, self.container, self.only, self.rewrite
+        for event, element in parser.read_events():
+            if event == 'start':
+                if state.dropping is not None:
+                    continue
+                classes = _class_set(element)
+                if drop and drop(element, classes):
+                    state.dropping = element
+                    continue
+                if state.container is None:
+                    if container(element, classes):
+                        state.container = element
+                elif only and state.only is None and only(element, classes):
+                    state.only = element
+                for name, capture_matcher in state.uncaptured:
+                    if name not in state.capturing and capture_matcher(element, classes):
+                        state.capturing[name] = element
+                continue
+            # end event, the whole subtree of element has been parsed and cleaned
+            if state.dropping is not None:
+                if state.dropping is element:
+                    state.dropping = None
+                    _remove(element)
+                continue
+            if state.capturing:
+                for name, capturing in list(state.capturing.items()):
+                    if capturing is element:
+                        # outside the containers the element is freed right after, keep a copy
+                        captured[name] = element if state.container is not None else copy.deepcopy(element)
+                        del state.capturing[name]
+                        state.uncaptured = [pair for pair in state.uncaptured if pair[0] != name]
+            if state.container is None:
+                if not state.capturing:
+                    _free(element)
+                continue
+            if rewrite and rewrite(element, captured) is False:
+                if state.container is element:
+                    state.container = None
+                elif state.only is element:
+                    state.only = None
+                _remove(element)
+                continue
+            if state.only is element:
+                state.only = None
+                yield _serialize(element)
+                element.clear(keep_tail=True)
+            elif state.container is element:
+                state.container = None
+                if not only:
+                    yield _serialize(element)
+                _free(element)
+
+
+def _free(element):
+    """
+    iterparse idiom: empty a finished element and forget the siblings before it
+    """
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+class _State:
+    __slots__ = ('dropping', 'container', 'only', 'capturing', 'uncaptured')
+
+    def __init__(self, capture):
+        self.dropping = None
+        self.container = None
+        self.only = None
+        self.capturing = {}
+        self.uncaptured = list(capture.items())
+
+
+def iter_chunks(content, chunk_size=CHUNK_SIZE):
+    """
+
+    :param content: bytes or str already in memory
+    :return: generator of chunk_size slices, for StreamCleaner.clean
+    """
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size]
+
+
+def page_encoding(response, head):
+    """
+    the charset a browser would use, lxml given bytes without a <meta charset> assumes latin-1
+
+    :param response: requests response of the page
+    :param head: first bytes of the body
+    :return: the Content-Type charset, else the one declared in head, else utf-8 when head decodes as
+             utf-8, else windows-1252
+    """
+    if 'charset=' in response.headers.get('Content-Type', '').lower() and response.encoding:
+        return response.encoding
+    declared = EncodingDetector.find_declared_encoding(head, is_html=True)
+    if declared:
+        try:
+            return codecs.lookup(declared).name
+        except LookupError:
+            pass
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(head)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'windows-1252'
+
+
+def strip_xml_declaration(text):
+    return _XML_DECLARATION.sub('', text, count=1)
+
+
+def decode_page(response):
+    """
+
+    :param response: requests response, body read
+    :return: body as str, see page_encoding
+    """
+    content = response.content
+    return strip_xml_declaration(content.decode(page_encoding(response, content), errors='replace'))
+
+
+def iter_decoded(response, chunks):
+    """
+    decode_page for a streamed body
+
+    :param response: requests response opened with stream=True
+    :param chunks: e.g. response.iter_content(CHUNK_SIZE), the first one is sniffed for the charset
+    :return: generator of str chunks for StreamCleaner.clean
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b'')
+    decoder = codecs.getincrementaldecoder(page_encoding(response, first))(errors='replace')
+    yield strip_xml_declaration(decoder.decode(first))
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
@@ -0,0 +1,108 @@
+from html import escape
+
+
+class _Image:
+    __slots__ = ('url', 'attrs', 'src_only')
+
+    def __init__(self, url, attrs, src_only=False):
+        self.url = url
+        self.attrs = attrs
+        self.src_only = src_only
+
+
+class HtmlDocument:
+    """
+    article page assembled from parts that are joined once in render (or written one by one with
+    write_to) instead of growing a string with += for every paragraph and inlined image
+    """
+
+    def __init__(self, title, stylesheet=''):
+        """
+
+        :param title: page title, also used by the pdf/epub section bookmarks
+        :param stylesheet: html for the head, e.g. add_print_css()
+        """
+        self.title = title
+        self.head = [stylesheet] if stylesheet else []
+        self.body = []
+        self.images = []
+
+    def add_head(self, *parts):
+        """
+
+        :param parts: html strings for the head, e.g. a site's own style tags
+        """
+        self.head.extend(parts)
+        return self
+
+    def add_header_link(self, url, text, tag='h1'):
+        """
+        the headline linking back to the article, as every parser puts on top of the body
+
+        :param url: article url
+        :param text: headline text, escaped here
+        :param tag: heading tag
+        """
+        self.body.append(f'<{tag}><a href="{escape(url)}">{escape(text)}</a></{tag}>')
+        return self
+
+    def add(self, *parts):
+        """
+
+        :param parts: html strings (or anything whose str() is html, like a BeautifulSoup tag) for the body
+        """
+        self.body.extend(str(part) for part in parts)
+        return self
+
+    def add_image(self, url, attrs='', src_only=False):
+        """
+        an image paragraph whose src is decided at render time, so inlined data uris are written once
+        instead of being substituted into the finished string
+
+        :param url: image url, collected in images for e.g. image_cache.data_uris
+        :param attrs: extra attributes for the img tag, e.g. ' align="middle"'
+        :param src_only: write just the src, for an <img src=" ... "> already in the parts around it
+        """
+        self.body.append(_Image(url, attrs, src_only))
+        self.images.append(url)
+        return self
+
+    def extend(self, parts):
+        """
+
+        :param parts: iterable of body html strings, e.g. a StreamCleaner output
+        """
+        self.body.extend(str(part) for part in parts)
+        return self
+
+    def _parts(self, image_sources):
+        yield f'<html><head><meta charset="utf-8"><title>{self.title}</title>'
+        yield from self.head
+        yield '</head><body>'
+        for part in self.body:
+            if isinstance(part, _Image) and part.src_only:
+                yield image_sources.get(part.url, part.url)
+            elif isinstance(part, _Image):
+                yield f'<p><img src="{image_sources.get(part.url, part.url)}"{part.attrs}/></p>'
+            else:
+                yield part
+        yield '</body></html>'
+
+    def render(self, image_sources=None):
+        """
+
+        :param image_sources: dict of image url -> src (e.g. a data uri), images missing from it keep their url
+        :return: the whole html document
+        """
+        return ''.join(self._parts(image_sources or {}))
+
+    def write_to(self, out, image_sources=None):
+        """
+
+        :param out: text file like object, the parts are written without joining them first
+        :param image_sources: see render
+        :return: out
+        """
+        for part in self._parts(image_sources or {}):
+            out.write(part)
+        return out
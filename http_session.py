@@ -0,0 +1,226 @@
+import random
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+
+
+USER_AGENT_LIST = [
+    # Chrome
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.113 '
+    'Safari/537.36',
+    'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.90 '
+    'Safari/537.36',
+    'Mozilla/5.0 (Windows NT 5.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.90 '
+    'Safari/537.36',
+    'Mozilla/5.0 (Windows NT 6.2; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.90 '
+    'Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/44.0.2403.157 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 6.3; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/60.0.3112.113 '
+    'Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/57.0.2987.133 '
+    'Safari/537.36',
+    'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/57.0.2987.133 '
+    'Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/55.0.2883.87 '
+    'Safari/537.36',
+    'Mozilla/5.0 (Windows NT 6.1; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/55.0.2883.87 '
+    'Safari/537.36',
+    # Firefox
+    'Mozilla/4.0 (compatible; MSIE 9.0; Windows NT 6.1)',
+    'Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (compatible; MSIE 9.0; Windows NT 6.1; WOW64; Trident/5.0)',
+    'Mozilla/5.0 (Windows NT 6.1; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (Windows NT 6.2; WOW64; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (Windows NT 10.0; WOW64; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (compatible; MSIE 9.0; Windows NT 6.0; Trident/5.0)',
+    'Mozilla/5.0 (Windows NT 6.3; WOW64; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (compatible; MSIE 9.0; Windows NT 6.1; Trident/5.0)',
+    'Mozilla/5.0 (Windows NT 6.1; Win64; x64; Trident/7.0; rv:11.0) like Gecko',
+    'Mozilla/5.0 (compatible; MSIE 10.0; Windows NT 6.1; WOW64; Trident/6.0)',
+    'Mozilla/5.0 (compatible; MSIE 10.0; Windows NT 6.1; Trident/6.0)',
+    'Mozilla/4.0 (compatible; MSIE 8.0; Windows NT 5.1; Trident/4.0; .NET CLR 2.0.50727; '
+    '.NET CLR 3.0.4506.2152; .NET CLR 3.5.30729)',
+    # Google Bot
+    'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+    # Bing bot
+    'Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)',
+    # Yahoo! bot
+    'Mozilla/5.0 (compatible; Yahoo! Slurp; http://help.yahoo.com/help/us/ysearch/slurp)'
+]
+
+# header profiles, 'random' is special cased and picks a fresh agent from USER_AGENT_LIST per request
+HEADER_PROFILES = {
+    'random': {},
+    'googlebot': {'User-Agent': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
+                  'Referer': 'https://www.facebook.com/',
+                  'X-Forwarded-For': '66.249.66.1'},
+    'mobile': {'User-Agent': 'Mozilla/5.0 (Linux; Android 10; SM-M315F) AppleWebKit/537.36 '
+                             '(KHTML, like Gecko) Chrome/81.0.4044.117 Mobile Safari/537.36'},
+    'plain': {},
+}
+
+# hosts which always want the same profile, anything else falls back to 'random'
+HOST_PROFILES = {
+    'www.wsj.com': 'googlebot',
+    'www.taipeitimes.com': 'googlebot',
+    'www.indianage.com': 'googlebot',
+    'mercury.postlight.com': 'mobile',
+}
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (6.05, 30)
+
+
+class SessionManager:
+    """
+    keeps one keep-alive requests.Session per host so repeated fetches of the same site
+    (article, amp page, images) reuse the already open TCP+TLS connection
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, host_pool_sizes=None, timeout=DEFAULT_TIMEOUT,
+                 header_profiles=None, host_profiles=None, limiter=rate_limiter.default_limiter):
+        """
+
+        :param pool_connections: number of urllib3 pools cached per session
+        :param pool_maxsize: connections kept alive per pool, used when host is not in host_pool_sizes
+        :param host_pool_sizes: dict of netloc -> pool_maxsize override
+        :param timeout: default timeout passed to requests, (connect, read) tuple or float
+        :param header_profiles: dict of profile name -> headers, merged over HEADER_PROFILES
+        :param host_profiles: dict of netloc -> profile name, merged over HOST_PROFILES
+        :param limiter: rate_limiter.HostRateLimiter every request waits on, None to send unthrottled
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.host_pool_sizes = host_pool_sizes or {}
+        self.timeout = timeout
+        self.header_profiles = dict(HEADER_PROFILES, **(header_profiles or {}))
+        self.host_profiles = dict(HOST_PROFILES, **(host_profiles or {}))
+        self.limiter = limiter
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, url):
+        """
+
+        :param url: full url or scheme://netloc
+        :return: the pooled session for the url's host, created on first use
+        """
+        parsed_uri = urlparse(url)
+        key = f'{parsed_uri.scheme}://{parsed_uri.netloc}'
+        session = self._sessions.get(key)
+        if session:
+            return session
+        with self._lock:
+            session = self._sessions.get(key)
+            if not session:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                      pool_maxsize=self.host_pool_sizes.get(parsed_uri.netloc, self.pool_maxsize))
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+        return session
+
+    def headers_for(self, url, profile=None):
+        """
+
+        :param url: url that is going to be fetched
+        :param profile: name from header_profiles, if None the host default is used
+        :return: headers dict for the request
+        """
+        if not profile:
+            profile = self.host_profiles.get(urlparse(url).netloc, 'random')
+        headers = dict(self.header_profiles[profile])
+        if profile == 'random':
+            headers['User-Agent'] = random.choice(USER_AGENT_LIST)
+        return headers
+
+    def request(self, method, url, profile=None, headers=None, timeout=None, **kwargs):
+        """
+
+        :param method: http method, 'GET' or 'HEAD'
+        :param url: the request will be run on this
+        :param profile: header profile name, see HEADER_PROFILES
+        :param headers: extra headers, override the profile
+        :param timeout: overrides the manager default
+        :return: http response
+        """
+        request_headers = self.headers_for(url, profile)
+        if headers:
+            request_headers.update(headers)
+        session = self.session_for(url)
+        if self.limiter:
+            self.limiter.acquire(urlparse(url).netloc)
+        return session.request(method, url, headers=request_headers, timeout=timeout or self.timeout, **kwargs)
+
+    def get(self, url, profile=None, headers=None, timeout=None, **kwargs):
+        return self.request('GET', url, profile=profile, headers=headers, timeout=timeout, **kwargs)
+
+    def head(self, url, profile=None, headers=None, timeout=None, **kwargs):
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('HEAD', url, profile=profile, headers=headers, timeout=timeout, **kwargs)
+
+    def connection_stats(self):
+        """
+
+        :return: dict of host -> {'requests', 'connections', 'reused'} read from the urllib3 pools
+        """
+        stats = {}
+        for key, session in list(self._sessions.items()):
+            adapter = session.get_adapter(key + '/')
+            pools = adapter.poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                host = f'{pool.scheme}://{pool.host}:{pool.port}'
+                entry = stats.setdefault(host, {'requests': 0, 'connections': 0, 'reused': 0})
+                entry['requests'] += pool.num_requests
+                entry['connections'] += pool.num_connections
+                entry['reused'] += max(pool.num_requests - pool.num_connections, 0)
+        return stats
+
+    def print_stats(self):
+        for host, entry in sorted(self.connection_stats().items()):
+            print(f"{host}: {entry['requests']} requests over {entry['connections']} connections "
+                  f"({entry['reused']} reused)")
+        if self.limiter:
+            self.limiter.print_stats()
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+default_manager = SessionManager()
+
+
+def configure(**kwargs):
+    """
+    replace the shared manager, takes the same arguments as SessionManager
+
+    :return: the new manager
+    """
+    global default_manager
+    old_manager = default_manager
+    default_manager = SessionManager(**kwargs)
+    old_manager.close()
+    return default_manager
+
+
+def get(url, profile=None, headers=None, timeout=None, **kwargs):
+    return default_manager.get(url, profile=profile, headers=headers, timeout=timeout, **kwargs)
+
+
+def head(url, profile=None, headers=None, timeout=None, **kwargs):
+    return default_manager.head(url, profile=profile, headers=headers, timeout=timeout, **kwargs)
+
+
+def connection_stats():
+    return default_manager.connection_stats()
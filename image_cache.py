@@ -0,0 +1,162 @@
+import base64
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import http_session
+import image_pipeline
+
+
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', 'image_cache')
+# an image fetched within this many seconds is served without asking the origin again
+IMAGE_MAX_AGE = 7 * 24 * 3600
+# matches placeholder(n), the index is group 1
+PLACEHOLDER = re.compile(r'__inline_img_(\d+)__')
+
+
+class ImageCache:
+    """
+    on disk content addressed image store, blobs live under objects/ab/<sha256> and a small
+    sqlite index maps each url to its blob digest and ETag for revalidation
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_age=IMAGE_MAX_AGE, max_workers=8):
+        """
+
+        :param cache_dir: folder holding index.sqlite3 and the objects folder
+        :param max_age: seconds an index entry is trusted without a conditional request
+        :param max_workers: parallel image downloads in fetch_many
+        """
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self.index_path = os.path.join(cache_dir, 'index.sqlite3')
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    os.makedirs(os.path.join(self.cache_dir, 'objects'), exist_ok=True)
+                    with closing(sqlite3.connect(self.index_path, timeout=30)) as conn, conn:
+                        conn.execute('CREATE TABLE IF NOT EXISTS images (url TEXT PRIMARY KEY, digest TEXT NOT NULL, '
+                                     'etag TEXT, fetched_at REAL NOT NULL)')
+                    self._ready = True
+        return closing(sqlite3.connect(self.index_path, timeout=30))
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest)
+
+    def _read_blob(self, digest):
+        try:
+            with open(self._blob_path(digest), 'rb') as blob:
+                return blob.read()
+        except OSError:
+            return None
+
+    def _write_blob(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f'{blob_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as blob:
+                blob.write(content)
+            os.replace(tmp_path, blob_path)
+        return digest
+
+    def _lookup(self, url):
+        with self._connect() as conn:
+            return conn.execute('SELECT digest, etag, fetched_at FROM images WHERE url = ?', (url,)).fetchone()
+
+    def _remember(self, url, digest, etag):
+        with self._connect() as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO images (url, digest, etag, fetched_at) VALUES (?, ?, ?, ?)',
+                         (url, digest, etag, time.time()))
+
+    def get(self, url):
+        """
+
+        :param url: absolute image url
+        :return: image bytes, from disk when fresh or still valid on the origin
+        """
+        entry = self._lookup(url)
+        cached = None
+        headers = {}
+        if entry:
+            digest, etag, fetched_at = entry
+            cached = self._read_blob(digest)
+            if cached is not None and time.time() - fetched_at < self.max_age:
+                return cached
+            if cached is not None and etag:
+                headers['If-None-Match'] = etag
+        response = http_session.get(url, profile='plain', headers=headers)
+        if response.status_code == 304 and cached is not None:
+            self._remember(url, entry[0], entry[1])
+            return cached
+        response.raise_for_status()
+        digest = self._write_blob(response.content)
+        self._remember(url, digest, response.headers.get('ETag'))
+        return response.content
+
+    def fetch_many(self, url_list):
+        """
+        download every url in parallel, duplicates are fetched once
+
+        :param url_list: image urls in article order
+        :return: dict of url -> bytes, urls that failed map to None
+        """
+        unique_urls = list(dict.fromkeys(url_list))
+        if not unique_urls:
+            return {}
+
+        def fetch(url):
+            try:
+                return self.get(url)
+            except Exception as e:
+                print(f'image fetch failed for {url}\n\terror is: {e.__class__}')
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(unique_urls))) as executor:
+            return dict(zip(unique_urls, executor.map(fetch, unique_urls)))
+
+    def data_uris(self, url_list, label=None):
+        """
+        fetch, downscale and recompress the images of one article
+
+        :param url_list: image urls in article order
+        :param label: printed with the bytes saved by image_pipeline, usually the article url
+        :return: dict of url -> data uri ready for an img src, failed urls are left out
+        """
+        fetched = {url: content for url, content in self.fetch_many(url_list).items() if content}
+        optimized = image_pipeline.optimize_many(list(fetched.values()), label=label)
+        return {url: to_data_uri(content, mime) for url, (content, mime) in zip(fetched, optimized)}
+
+
+def placeholder(index):
+    return f'__inline_img_{index}__'
+
+
+def split_placeholders(html):
+    """
+
+    :param html: html holding placeholder(n) markers
+    :return: list alternating html text and placeholder indexes (ints), starting and ending with text
+    """
+    pieces = PLACEHOLDER.split(html)
+    pieces[1::2] = [int(index) for index in pieces[1::2]]
+    return pieces
+
+
+def to_data_uri(content, mime='image/jpeg'):
+    encoded_string = base64.b64encode(content).decode('ascii')
+    return f'data:{mime};base64,{encoded_string}'
+
+
+default_cache = ImageCache()
@@ -0,0 +1,134 @@
+import io
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import assets
+
+
+A4_WIDTH_CM = 21.0
+PRINT_DPI = 150
+# largest encoded size an image may keep, quality steps down until it fits or MIN_QUALITY is hit
+IMAGE_BYTE_BUDGET = 150 * 1024
+START_QUALITY = 80
+MIN_QUALITY = 45
+PIL_MIME_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'GIF': 'image/gif', 'WEBP': 'image/webp',
+                  'BMP': 'image/bmp', 'TIFF': 'image/tiff'}
+
+
+def page_width_px(js_path='papersize.js', dpi=PRINT_DPI):
+    """
+    printable A4 width, left and right margins are read from the paperSize in papersize.js
+
+    :return: width in pixels at dpi
+    """
+    margins = {'left': 0.55, 'right': 0.55}
+    try:
+        paper_size = assets.get(js_path)
+        for side in margins:
+            found = re.search(side + r'''\s*:\s*["']([\d.]+)cm''', paper_size)
+            if found:
+                margins[side] = float(found.group(1))
+    except OSError:
+        pass
+    return int((A4_WIDTH_CM - margins['left'] - margins['right']) / 2.54 * dpi)
+
+
+PRINT_WIDTH_PX = page_width_px()
+
+
+def sniff_mime(content):
+    """
+
+    :param content: raw image bytes
+    :return: mime type from the bytes themselves, not from the url or server header
+    """
+    head = content[:512].lstrip()
+    if head.startswith(b'<svg') or (head.startswith(b'<?xml') and b'<svg' in head):
+        return 'image/svg+xml'
+    # Pillow is loaded by the pool workers and the image fetching parsers only
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            return PIL_MIME_TYPES.get(image.format, 'application/octet-stream')
+    except Exception:
+        return 'application/octet-stream'
+
+
+def optimize_image(content, max_width=PRINT_WIDTH_PX, byte_budget=IMAGE_BYTE_BUDGET):
+    """
+    downscale to the printable width and recompress, runs in the pool workers
+
+    :param content: raw image bytes
+    :return: (bytes, mime type), the original bytes are kept whenever re-encoding does not help
+    """
+    mime = sniff_mime(content)
+    if mime in ('image/svg+xml', 'application/octet-stream'):
+        return content, mime
+    from PIL import Image
+    try:
+        image = Image.open(io.BytesIO(content))
+        if getattr(image, 'is_animated', False):
+            return content, mime
+        image.load()
+    except Exception:
+        return content, mime
+    resized = image.width > max_width
+    if resized:
+        height = max(1, round(image.height * max_width / image.width))
+        image = image.resize((max_width, height), Image.LANCZOS)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    out = io.BytesIO()
+    if has_alpha:
+        image.save(out, format='PNG', optimize=True)
+        new_mime = 'image/png'
+    else:
+        image = image.convert('RGB')
+        quality = START_QUALITY
+        while True:
+            out = io.BytesIO()
+            image.save(out, format='JPEG', quality=quality, optimize=True, progressive=True)
+            if out.tell() <= byte_budget or quality <= MIN_QUALITY:
+                break
+            quality -= 10
+        new_mime = 'image/jpeg'
+    if not resized and out.tell() >= len(content):
+        return content, mime
+    return out.getvalue(), new_mime
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=int(os.environ.get('IMAGE_WORKERS', os.cpu_count() or 2)))
+        return _pool
+
+
+def optimize_many(content_list, label=None):
+    """
+    optimize a batch of images on the process pool and print the bytes saved
+
+    :param content_list: raw image bytes in article order
+    :param label: printed with the savings, usually the article url
+    :return: list of (bytes, mime type) in the same order
+    """
+    global _pool
+    if not content_list:
+        return []
+    try:
+        results = list(_get_pool().map(optimize_image, content_list))
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool = None
+        results = [optimize_image(content) for content in content_list]
+    before = sum(len(content) for content in content_list)
+    after = sum(len(content) for content, mime in results)
+    print(f'{label or "images"}: {len(content_list)} images {before} -> {after} bytes, saved {before - after}')
+    return results
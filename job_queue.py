@@ -0,0 +1,226 @@
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import closing
+from multiprocessing import Process
+
+import article_cache
+
+
+JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH', 'jobs.sqlite3')
+# queued + running jobs allowed before enqueue pushes back with QueueFull
+JOB_QUEUE_MAX_PENDING = int(os.environ.get('JOB_QUEUE_MAX_PENDING', 50))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# a running job not finished after this long belongs to a dead worker and is queued again
+JOB_STALE_AFTER = 15 * 60
+# finished jobs are kept this long so their status can still be polled
+JOB_KEEP_FINISHED = 24 * 3600
+JOB_POLL_INTERVAL = 1.0
+
+Job = namedtuple(typename='Job', field_names=['Id', 'Url', 'Renderer', 'Status', 'Error', 'Title', 'Result',
+                                              'Created_At', 'Finished_At'])
+
+
+class QueueFull(Exception):
+    """
+    raised by enqueue when JobQueue.max_pending jobs are already waiting
+    """
+
+
+class JobQueue:
+    """
+    pdf jobs kept in a local sqlite file, the web process enqueues and polls, worker processes
+    claim and run them. identical urls in flight share one job
+    """
+
+    def __init__(self, db_path=JOB_QUEUE_PATH, max_pending=JOB_QUEUE_MAX_PENDING):
+        """
+
+        :param db_path: sqlite file shared by the web and worker processes
+        :param max_pending: queued + running jobs allowed before enqueue raises QueueFull
+        """
+        self.db_path = db_path
+        self.max_pending = max_pending
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    with closing(sqlite3.connect(self.db_path, timeout=30)) as conn, conn:
+                        conn.execute('PRAGMA journal_mode=WAL')
+                        conn.execute('CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, url TEXT NOT NULL, '
+                                     'key TEXT NOT NULL, renderer TEXT NOT NULL, status TEXT NOT NULL, '
+                                     'error TEXT, title TEXT, result TEXT, worker TEXT, '
+                                     'created_at REAL NOT NULL, started_at REAL, finished_at REAL)')
+                        conn.execute('CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, created_at)')
+                        conn.execute('CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, renderer, status)')
+                    self._ready = True
+        # isolation_level None so BEGIN IMMEDIATE below is the only transaction
+        return closing(sqlite3.connect(self.db_path, timeout=30, isolation_level=None))
+
+    def enqueue(self, url, renderer=None):
+        """
+
+        :param url: article url
+        :param renderer: render_backend name
+        :return: job id, the id of the job already queued or running for the same url and renderer if any
+        """
+        key = article_cache.canonical_url(url)
+        renderer = renderer or ''
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute("SELECT id FROM jobs WHERE key = ? AND renderer = ? "
+                                   "AND status IN ('queued', 'running')", (key, renderer)).fetchone()
+                if row:
+                    conn.execute('COMMIT')
+                    return row[0]
+                pending, = conn.execute("SELECT COUNT(*) FROM jobs "
+                                        "WHERE status IN ('queued', 'running')").fetchone()
+                if pending >= self.max_pending:
+                    raise QueueFull(f'{pending} jobs pending')
+                job_id = uuid.uuid4().hex
+                conn.execute("INSERT INTO jobs (id, url, key, renderer, status, created_at) "
+                             "VALUES (?, ?, ?, ?, 'queued', ?)", (job_id, url, key, renderer, time.time()))
+                conn.execute('COMMIT')
+                return job_id
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def claim(self, worker_id):
+        """
+
+        :param worker_id: name recorded on the job, see worker_loop
+        :return: Job now marked running, None when nothing is queued
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute("UPDATE jobs SET status = 'queued', worker = NULL "
+                             "WHERE status = 'running' AND started_at < ?", (now - JOB_STALE_AFTER,))
+                conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                             (now - JOB_KEEP_FINISHED,))
+                row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' "
+                                   "ORDER BY created_at LIMIT 1").fetchone()
+                if row:
+                    conn.execute("UPDATE jobs SET status = 'running', worker = ?, started_at = ? WHERE id = ?",
+                                 (worker_id, now, row[0]))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+        return self.get(row[0]) if row else None
+
+    def _finish(self, job_id, status, title=None, result=None, error=None):
+        with self._connect() as conn:
+            conn.execute('UPDATE jobs SET status = ?, title = ?, result = ?, error = ?, finished_at = ? '
+                         'WHERE id = ?', (status, title, result, error, time.time(), job_id))
+
+    def complete(self, job_id, title, result):
+        """
+
+        :param job_id: id from claim
+        :param title: article title, used for the download name
+        :param result: path of the pdf in the article cache
+        """
+        self._finish(job_id, 'done', title=title, result=result)
+
+    def fail(self, job_id, error):
+        self._finish(job_id, 'failed', error=str(error))
+
+    def get(self, job_id):
+        """
+
+        :param job_id: id returned by enqueue
+        :return: Job, None for unknown or expired ids
+        """
+        with self._connect() as conn:
+            row = conn.execute('SELECT id, url, renderer, status, error, title, result, created_at, finished_at '
+                               'FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return Job(*row) if row else None
+
+    def pending(self):
+        """
+
+        :return: number of queued + running jobs
+        """
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+
+default_queue = JobQueue()
+
+
+def run_job(job_queue, job):
+    """
+    scrape and render one claimed job into the article cache
+
+    :param job_queue: JobQueue the job was claimed from
+    :param job: Job from claim
+    """
+    # imported here so the web process can enqueue without loading selenium and the parsers
+    import article_pipeline
+    try:
+        pdf_file, title_txt = article_pipeline.article_pdf(job.Url, renderer=job.Renderer or None)
+        if pdf_file is None:
+            job_queue.fail(job.Id, 'no parser produced an article for this url')
+        elif isinstance(pdf_file, str):
+            job_queue.complete(job.Id, title_txt, pdf_file)
+        else:
+            # the article cache refused the pdf, nothing on disk to point the result endpoint at
+            pdf_file.close()
+            job_queue.fail(job.Id, 'pdf could not be stored')
+    except Exception as e:
+        print(f'job {job.Id} failed {job.Url}\n\terror is: {e.__class__} {e}')
+        job_queue.fail(job.Id, f'{e.__class__.__name__}: {e}')
+
+
+def worker_loop(job_queue=None, worker_id=None, poll_interval=JOB_POLL_INTERVAL):
+    """
+    claim and run jobs until interrupted
+
+    :param job_queue: JobQueue, default_queue when None
+    :param worker_id: defaults to host:pid
+    :param poll_interval: seconds to sleep when the queue is empty
+    """
+    job_queue = job_queue or default_queue
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    print(f'job worker {worker_id} started')
+    while True:
+        job = job_queue.claim(worker_id)
+        if not job:
+            time.sleep(poll_interval)
+            continue
+        start = time.perf_counter()
+        run_job(job_queue, job)
+        print(f'job {job.Id} {job.Url} took {time.perf_counter() - start:.1f}s')
+
+
+def main(workers=JOB_WORKERS):
+    """
+    run worker processes draining default_queue, e.g. `python job_queue.py 4`
+
+    :param workers: number of worker processes
+    """
+    processes = [Process(target=worker_loop, daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else JOB_WORKERS)
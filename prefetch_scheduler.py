@@ -0,0 +1,229 @@
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import article_cache
+import edition_crawler
+import state_store
+
+
+# daily pages served under a fixed url: the insights summary (parse_insights_daily_non_outline) and
+# this day in history (parse_history_articles). their cached copy is yesterday's, it is dropped first
+DAILY_URLS = [
+    'https://www.insightsonindia.com/',
+    'http://www.thepeoplehistory.com/this-day-in-history.html',
+]
+# lists of the articles the run compiles: the queued editorial sheets and the random_economist /
+# random_epw picks drawn by warm_caches. the whole economist/epw archives are not warmed, they only grow
+WARM_LISTS = (('manual', 'queued'), ('auto', 'queued'), ('economist-picks', 'queued'), ('epw-picks', 'queued'))
+PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 2))
+# task -> cron expression (minute hour day-of-month month day-of-week) in the server's local time,
+# PREFETCH_SCHEDULE='editions=0 2 * * *;warm=30 4 * * *' overrides entries
+SCHEDULE = {
+    'editions': '0 3 * * *',
+    'warm': '30 3 * * *',
+}
+# never sleep longer than this, so a changed clock or a suspended machine is noticed
+MAX_SLEEP = 60
+_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def parse_field(field, low, high):
+    """
+
+    :param field: one cron field: '*', '5', '1-5', '*/15', '0-30/10' or a comma separated list of those
+    :param low: smallest value of the field
+    :param high: largest value of the field
+    :return: set of the values it matches
+    :raises ValueError: for anything else or values out of range
+    """
+    values = set()
+    for part in field.split(','):
+        spec, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if spec == '*':
+            start, end = low, high
+        elif '-' in spec:
+            start, end = (int(value) for value in spec.split('-', 1))
+        else:
+            start = end = int(spec)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f'cron field {field!r} out of {low}-{high}')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    a 5 field cron expression, day of month and day of week match like cron: either one when both
+    are restricted. 7 is not accepted for sunday, use 0
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'cron expression {expression!r} needs 5 fields')
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            parse_field(field, low, high) for field, (low, high) in zip(fields, _FIELD_RANGES))
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def matches_day(self, day):
+        day_match = day.day in self.days
+        # cron counts sunday as 0, datetime.weekday() monday as 0
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day.month in self.months and day_match and weekday_match
+        return day.month in self.months and (day_match or weekday_match)
+
+    def next_after(self, moment):
+        """
+
+        :param moment: datetime
+        :return: first matching minute after moment, None if nothing matches within 5 years (e.g. 31 2 *)
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=5 * 366)
+        while candidate < limit:
+            if not self.matches_day(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        return None
+
+
+def crawl_editions():
+    """
+    new economist and epw edition articles into the candidates, see edition_crawler
+    """
+    return edition_crawler.default_crawler.crawl_all()
+
+
+def warm_caches(workers=PREFETCH_WORKERS, renderer=None):
+    """
+    scrape (with their images, which the parsers inline through image_cache) and render the articles
+    the daily run and /get_pdf will ask for into the article cache
+
+    :return: number of articles warmed
+    """
+    import methods_file
+    methods_file.GetResourceMethods().queue_random_picks()
+    for url in DAILY_URLS:
+        article_cache.default_cache.delete(url)
+    url_list = list(DAILY_URLS)
+    for source, state in WARM_LISTS:
+        url_list.extend(state_store.default_store.urls(source, state))
+    url_list = list(dict.fromkeys(url_list))
+    return edition_crawler.prefetch(url_list, workers=workers, render=True, renderer=renderer)
+
+
+TASKS = {
+    'editions': crawl_editions,
+    'warm': warm_caches,
+}
+
+
+def read_schedule(value=None):
+    """
+
+    :param value: 'task=cron;task=cron', PREFETCH_SCHEDULE when None
+    :return: dict of task -> CronSchedule, SCHEDULE with the given entries replaced
+    """
+    value = os.environ.get('PREFETCH_SCHEDULE', '') if value is None else value
+    schedule = dict(SCHEDULE)
+    for entry in value.split(';'):
+        if entry.strip():
+            name, _, expression = entry.partition('=')
+            schedule[name.strip()] = expression.strip()
+    unknown = set(schedule) - set(TASKS)
+    if unknown:
+        raise ValueError(f'unknown prefetch tasks {sorted(unknown)}, expected some of {sorted(TASKS)}')
+    return {name: CronSchedule(expression) for name, expression in schedule.items() if expression}
+
+
+class PrefetchScheduler:
+    """
+    runs TASKS at their cron times in one long lived process, a task that fails is logged and runs
+    again at its next time. runs missed while the process was down are not caught up
+    """
+
+    def __init__(self, schedule=None, tasks=None, clock=datetime.now, sleep=time.sleep):
+        """
+
+        :param schedule: dict of task -> CronSchedule, read_schedule() if None
+        :param tasks: dict of task -> callable, TASKS if None
+        :param clock: returns the current local datetime
+        :param sleep: sleep function, replaceable for tests
+        """
+        self.schedule = read_schedule() if schedule is None else schedule
+        self.tasks = TASKS if tasks is None else tasks
+        self.clock = clock
+        self.sleep = sleep
+
+    def upcoming(self, moment=None):
+        """
+
+        :return: dict of task -> next run datetime, in schedule order, tasks that never run are left out
+        """
+        moment = moment or self.clock()
+        runs = ((name, cron.next_after(moment)) for name, cron in self.schedule.items())
+        return {name: when for name, when in runs if when is not None}
+
+    def run_task(self, name):
+        start = time.perf_counter()
+        print(f'prefetch: {name} started')
+        try:
+            self.tasks[name]()
+        except Exception as e:
+            print(f'prefetch: {name} failed\n\terror is: {e.__class__} {e}')
+            return False
+        print(f'prefetch: {name} took {time.perf_counter() - start:.1f}s')
+        return True
+
+    def run_forever(self):
+        upcoming = self.upcoming()
+        for name, when in upcoming.items():
+            print(f'prefetch: {name} next at {when:%Y-%m-%d %H:%M}')
+        while upcoming:
+            # ties go to the task listed first, editions before warm
+            name = min(upcoming, key=upcoming.get)
+            wait = (upcoming[name] - self.clock()).total_seconds()
+            if wait > 0:
+                self.sleep(min(wait, MAX_SLEEP))
+                continue
+            self.run_task(name)
+            # a task that came due while this one ran keeps its time and runs next
+            when = self.schedule[name].next_after(max(upcoming[name], self.clock()))
+            if when is None:
+                del upcoming[name]
+            else:
+                upcoming[name] = when
+
+
+def main():
+    parser = argparse.ArgumentParser(description='warm the article cache before the daily run')
+    parser.add_argument('--now', nargs='*', metavar='TASK',
+                        help=f'run tasks once and exit, all of {", ".join(TASKS)} if none given')
+    parser.add_argument('--next', action='store_true', help='print when each task runs next')
+    args = parser.parse_args()
+    scheduler = PrefetchScheduler()
+    if args.next:
+        for name, when in scheduler.upcoming().items():
+            print(f'{name}: {when:%Y-%m-%d %H:%M}')
+    elif args.now is not None:
+        for name in args.now or TASKS:
+            if name not in TASKS:
+                parser.error(f'unknown task {name}')
+            scheduler.run_task(name)
+    else:
+        scheduler.run_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+# requests per second and burst for every host not in HOST_RATES
+DEFAULT_QPS = float(os.environ.get('HOST_QPS', 4))
+DEFAULT_BURST = int(os.environ.get('HOST_BURST', 8))
+# (qps, burst) for the origins that throttle a whole edition being fetched at once
+HOST_RATES = {
+    'www.economist.com': (1.0, 2),
+    'www.epw.in': (1.0, 2),
+    'www.thehindu.com': (2.0, 4),
+    'www.insightsonindia.com': (0.5, 1),
+    'mercury.postlight.com': (1.0, 2),
+}
+
+
+class TokenBucket:
+    """
+    qps tokens a second up to burst, a request takes one. reserve never refuses: it takes the token
+    ahead of time and returns how long to wait for it, so concurrent callers queue up at the bucket's
+    rate instead of polling
+    """
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, now):
+        """
+
+        :return: seconds until a token is free, 0 if one is free now
+        """
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self, now):
+        """
+
+        :return: seconds the caller has to wait before sending
+        """
+        wait = self.ready_in(now)
+        self.tokens -= 1
+        return wait
+
+
+class HostRateLimiter:
+    """
+    a token bucket per host, every request of http_session goes through acquire
+    """
+
+    def __init__(self, qps=DEFAULT_QPS, burst=DEFAULT_BURST, host_rates=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+
+        :param qps: default requests per second per host
+        :param burst: default bucket size, requests sent back to back after an idle period
+        :param host_rates: dict of netloc -> (qps, burst), merged over HOST_RATES
+        :param clock: monotonic clock
+        :param sleep: callable(seconds)
+        """
+        self.qps = qps
+        self.burst = burst
+        self.host_rates = dict(HOST_RATES, **(host_rates or {}))
+        self.clock = clock
+        self.sleep = sleep
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if not bucket:
+            qps, burst = self.host_rates.get(host, (self.qps, self.burst))
+            bucket = self._buckets[host] = TokenBucket(qps, burst, self.clock())
+        return bucket
+
+    def ready_in(self, host):
+        """
+
+        :param host: netloc
+        :return: seconds until the host may be fetched again without waiting
+        """
+        with self._lock:
+            return self._bucket(host).ready_in(self.clock())
+
+    def acquire(self, host):
+        """
+        block until the host's bucket lets a request through
+
+        :param host: netloc
+        :return: seconds waited
+        """
+        with self._lock:
+            wait = self._bucket(host).reserve(self.clock())
+            entry = self._stats.setdefault(host, {'requests': 0, 'delayed': 0, 'waited': 0.0})
+            entry['requests'] += 1
+            if wait > 0:
+                entry['delayed'] += 1
+                entry['waited'] += wait
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+    def stats(self):
+        """
+
+        :return: dict of host -> {'requests', 'delayed', 'waited'}
+        """
+        with self._lock:
+            return {host: dict(entry) for host, entry in self._stats.items()}
+
+    def print_stats(self):
+        for host, entry in sorted(self.stats().items()):
+            print(f"{host}: {entry['requests']} requests, {entry['delayed']} delayed by the rate limit "
+                  f"for {entry['waited']:.1f}s")
+
+
+class FairScheduler:
+    """
+    hands the items of a batch to worker threads one host at a time: hosts take turns, a host with
+    max_in_flight items running is passed over and among the others the first whose bucket has a
+    token ready wins, so workers go to whichever origin can take a request now instead of queueing
+    behind the busiest one
+    """
+
+    def __init__(self, items, key, limiter=None, max_in_flight=None):
+        """
+
+        :param items: iterable of work items
+        :param key: callable(item) -> host
+        :param limiter: HostRateLimiter consulted for ready_in, None for plain round robin
+        :param max_in_flight: callable(host) -> concurrent items allowed, None for no limit
+        """
+        self.limiter = limiter
+        self.max_in_flight = max_in_flight
+        self._queues = OrderedDict()
+        for item in items:
+            self._queues.setdefault(key(item), deque()).append(item)
+        self._in_flight = {}
+        self._condition = threading.Condition()
+
+    def _pick(self):
+        best, best_wait = None, None
+        for host in self._queues:
+            if self.max_in_flight and self._in_flight.get(host, 0) >= self.max_in_flight(host):
+                continue
+            wait = self.limiter.ready_in(host) if self.limiter else 0.0
+            if wait <= 0:
+                return host
+            if best is None or wait < best_wait:
+                best, best_wait = host, wait
+        return best
+
+    def take(self):
+        """
+        block until an item may start
+
+        :return: (host, item), None when the batch is exhausted
+        """
+        with self._condition:
+            while True:
+                if not self._queues:
+                    return None
+                host = self._pick()
+                if host is not None:
+                    break
+                # every host with work left is at max_in_flight
+                self._condition.wait()
+            queue = self._queues[host]
+            item = queue.popleft()
+            if queue:
+                self._queues.move_to_end(host)
+            else:
+                del self._queues[host]
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            return host, item
+
+    def done(self, host):
+        """
+
+        :param host: host returned by take, once its item finished
+        """
+        with self._condition:
+            self._in_flight[host] -= 1
+            self._condition.notify_all()
+
+    def __iter__(self):
+        """
+        items for one worker, done is called when the worker asks for the next one
+        """
+        while True:
+            taken = self.take()
+            if taken is None:
+                return
+            host, item = taken
+            try:
+                yield item
+            finally:
+                self.done(host)
+
+
+default_limiter = HostRateLimiter()
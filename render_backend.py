@@ -0,0 +1,151 @@
+import base64
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import assets
+import renderer_pool
+
+
+DEFAULT_BACKEND = os.environ.get('RENDER_BACKEND', 'phantomjs')
+# pdfs stay in memory up to this size, bigger ones roll over to an anonymous temp file
+SPOOL_MAX_SIZE = int(os.environ.get('PDF_SPOOL_MAX_SIZE', 4 * 1024 * 1024))
+
+
+def read_print_css(name='print.css'):
+    """
+
+    :param name: stylesheet in the asset registry
+    :return: print.css without the surrounding style tag, usable as a standalone stylesheet
+    """
+    return re.sub(r'</?style[^>]*>', '', assets.get(name))
+
+
+class RenderBackend:
+    """
+    turns an article html string into pdf bytes written to a binary file object
+    """
+    name = None
+
+    def render(self, html_str, out):
+        """
+
+        :param html_str: full html document as built by the parsers
+        :param out: binary file like object the pdf is written to
+        :return: out
+        """
+        raise NotImplementedError
+
+
+class PhantomJSBackend(RenderBackend):
+    """
+    renders with a pooled PhantomJS using the paperSize from papersize.js
+    """
+    name = 'phantomjs'
+
+    def __init__(self, js_path='papersize.js'):
+        self.js_path = js_path
+
+    def render(self, html_str, out):
+        html_bs64 = base64.b64encode(html_str.encode('utf-8')).decode()
+        temp_script = assets.get(self.js_path)
+        # phantom can only render pdfs to a path, mkstemp keeps concurrent requests apart
+        fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            with renderer_pool.driver('phantomjs') as driver:
+                driver.get("data:text/html;base64," + html_bs64)
+
+                def execute(script, args):
+                    driver.execute('executePhantomScript', {'script': script, 'args': args})
+
+                # set page format
+                # inside the execution script, web_page is "this"
+                page_format = f'this.{temp_script};'
+                execute(page_format, [])
+
+                # render current page
+                render = '''this.render("{}")'''.format(pdf_path.replace('\\', '\\\\'))
+                execute(render, [])
+            with open(pdf_path, 'rb') as fo:
+                shutil.copyfileobj(fo, out)
+        finally:
+            os.remove(pdf_path)
+        return out
+
+
+def _weasyprint_pdf(html_str, stylesheet, base_url):
+    from weasyprint import HTML, CSS
+    return HTML(string=html_str, base_url=base_url).write_pdf(stylesheets=[CSS(string=stylesheet)])
+
+
+class WeasyPrintBackend(RenderBackend):
+    """
+    renders in process with WeasyPrint, page size, margins and the footer come from the
+    @page rules of print.css so no browser is involved
+    """
+    name = 'weasyprint'
+
+    def __init__(self, processes=0, css_path='print.css'):
+        """
+
+        :param processes: 0 renders in the calling thread, otherwise on a process pool of that size
+        :param css_path: asset name of the stylesheet with the @page rules, applied even when a parser left it out
+        """
+        self.processes = processes
+        self.css_path = css_path
+        self._pool = None
+
+    def render(self, html_str, out):
+        args = (html_str, read_print_css(self.css_path), os.getcwd())
+        if self.processes:
+            if not self._pool:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes)
+            pdf_bytes = self._pool.submit(_weasyprint_pdf, *args).result()
+        else:
+            pdf_bytes = _weasyprint_pdf(*args)
+        out.write(pdf_bytes)
+        return out
+
+
+BACKENDS = {
+    'phantomjs': PhantomJSBackend(),
+    'weasyprint': WeasyPrintBackend(processes=int(os.environ.get('WEASYPRINT_PROCESSES', 0))),
+}
+
+
+def backend_name(name=None):
+    """
+
+    :param name: renderer asked for, may be None or unknown
+    :return: key of the BACKENDS entry get_backend(name) returns, what rendered pdfs are cached under
+    """
+    return name if name in BACKENDS else DEFAULT_BACKEND
+
+
+def get_backend(name=None):
+    """
+
+    :param name: key of BACKENDS, unknown or empty names fall back to DEFAULT_BACKEND
+    :return: RenderBackend
+    """
+    return BACKENDS[backend_name(name)]
+
+
+def pdf_buffer():
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+b')
+
+
+def render_pdf(html_str, name=None):
+    """
+
+    :param html_str: full html document as built by the parsers
+    :param name: backend name, see get_backend
+    :return: spooled buffer holding the pdf, rewound to the start
+    """
+    out = pdf_buffer()
+    get_backend(name).render(html_str, out)
+    out.seek(0)
+    return out
@@ -0,0 +1,235 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+GECKODRIVER_PATH = 'C:\\Users\\Sabyasachi\\Google Drive\\Python Projects\\Daily_Compiler\\geckodriver.exe'
+FIREFOX_PROFILE_PATH = 'C:\\Users\\Sabyasachi\\AppData\\Roaming\\Mozilla\\Firefox\\Profiles\\703g68w9.python_user'
+FIREFOX_RELEASE_PROFILE_PATH = 'C:\\Users\\Sabyasachi\\AppData\\Roaming\\Mozilla\\Firefox\\Profiles\\' \
+                               'wxoz187x.default-release'
+
+
+def _phantomjs():
+    from selenium import webdriver
+    driver = webdriver.PhantomJS()
+    # hack while the python interface lags
+    driver.command_executor._commands['executePhantomScript'] = ('POST', '/session/$sessionId/phantom/execute')
+    return driver
+
+
+def _firefox_user_profile(headless=False, use_geckodriver_path=False):
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options
+    options = Options()
+    fp = webdriver.FirefoxProfile(FIREFOX_PROFILE_PATH)
+    fp.DEFAULT_PREFERENCES['frozen']['extensions.autoDisableScopes'] = 0
+    options.set_preference('extensions.enabledScopes', 15)
+    if headless:
+        options.add_argument('-headless')
+    fp.update_preferences()
+    if use_geckodriver_path:
+        return webdriver.Firefox(firefox_profile=fp, options=options, executable_path=GECKODRIVER_PATH)
+    return webdriver.Firefox(firefox_profile=fp, options=options)
+
+
+def _firefox_direct():
+    from selenium import webdriver
+    webdriver.DesiredCapabilities.FIREFOX['proxy'] = {
+        "proxyType": 'DIRECT'
+    }
+    return webdriver.Firefox(executable_path=GECKODRIVER_PATH)
+
+
+def _firefox_release_profile():
+    from selenium import webdriver
+    return webdriver.Firefox(firefox_profile=webdriver.FirefoxProfile(FIREFOX_RELEASE_PROFILE_PATH))
+
+
+# kind -> (factory, default pool size)
+DRIVER_KINDS = {
+    'phantomjs': (_phantomjs, int(os.environ.get('PHANTOMJS_POOL_SIZE', 2))),
+    'firefox_amp': (lambda: _firefox_user_profile(use_geckodriver_path=True), 1),
+    'firefox_profile': (_firefox_user_profile, 1),
+    'firefox_headless': (lambda: _firefox_user_profile(headless=True), 1),
+    'firefox_direct': (_firefox_direct, 1),
+    'firefox_release': (_firefox_release_profile, 1),
+}
+# renders before a driver is quit and replaced, keeps phantomjs memory growth in check
+MAX_JOBS_PER_DRIVER = int(os.environ.get('RENDERER_MAX_JOBS', 50))
+JOB_TIMEOUT = int(os.environ.get('RENDERER_JOB_TIMEOUT', 90))
+
+
+class DriverPool:
+    """
+    keeps up to size warm selenium drivers and hands one out per job, a driver is quit and
+    replaced after max_jobs jobs, after any exception inside the job or when the job overruns
+    """
+
+    def __init__(self, factory, size=2, max_jobs=MAX_JOBS_PER_DRIVER, job_timeout=JOB_TIMEOUT, name='driver'):
+        """
+
+        :param factory: callable returning a new webdriver
+        :param size: maximum number of live drivers
+        :param max_jobs: jobs served by one driver before it is recycled
+        :param job_timeout: seconds a job may hold a driver before the driver is killed
+        :param name: used in stats and log lines
+        """
+        self.factory = factory
+        self.size = size
+        self.max_jobs = max_jobs
+        self.job_timeout = job_timeout
+        self.name = name
+        self._idle = queue.LifoQueue()
+        self._jobs_done = {}
+        self._live = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.recycled = 0
+        self.timeouts = 0
+        self.latencies = deque(maxlen=200)
+
+    def _acquire(self):
+        deadline = time.time() + self.job_timeout
+        with self._lock:
+            self._waiting += 1
+        try:
+            while True:
+                try:
+                    return self._idle.get_nowait()
+                except queue.Empty:
+                    pass
+                with self._lock:
+                    create = self._live < self.size
+                    if create:
+                        self._live += 1
+                if create:
+                    try:
+                        driver = self.factory()
+                    except Exception:
+                        with self._lock:
+                            self._live -= 1
+                        raise
+                    self._jobs_done[id(driver)] = 0
+                    return driver
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(f'no {self.name} free after {self.job_timeout} seconds')
+                try:
+                    # wake up now and then, a recycled driver frees a slot without touching the queue
+                    return self._idle.get(timeout=min(remaining, 0.5))
+                except queue.Empty:
+                    continue
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _discard(self, driver):
+        self._jobs_done.pop(id(driver), None)
+        with self._lock:
+            self._live -= 1
+            self.recycled += 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _release(self, driver, healthy):
+        self._jobs_done[id(driver)] = self._jobs_done.get(id(driver), 0) + 1
+        if healthy and self._jobs_done[id(driver)] < self.max_jobs:
+            try:
+                driver.get('about:blank')
+                self._idle.put(driver)
+                return
+            except Exception:
+                pass
+        self._discard(driver)
+
+    @contextmanager
+    def driver(self):
+        """
+        with pool.driver() as driver: ... checks a driver out for one job
+        """
+        start = time.time()
+        driver = self._acquire()
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            print(f'{self.name} job overran {self.job_timeout} seconds, killing driver')
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+        watchdog = threading.Timer(self.job_timeout, kill)
+        watchdog.daemon = True
+        watchdog.start()
+        healthy = False
+        try:
+            yield driver
+            healthy = True
+        finally:
+            watchdog.cancel()
+            if timed_out.is_set():
+                healthy = False
+            self._release(driver, healthy)
+            with self._lock:
+                self.jobs += 1
+                self.timeouts += int(timed_out.is_set())
+                self.latencies.append(time.time() - start)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            jobs, recycled, timeouts = self.jobs, self.recycled, self.timeouts
+            live, waiting = self._live, self._waiting
+        return {'live': live, 'idle': self._idle.qsize(), 'queue_depth': waiting, 'jobs': jobs,
+                'recycled': recycled, 'timeouts': timeouts,
+                'avg_latency': sum(latencies) / len(latencies) if latencies else 0,
+                'p95_latency': latencies[int(len(latencies) * 0.95)] if latencies else 0}
+
+    def close(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(kind):
+    """
+
+    :param kind: key of DRIVER_KINDS
+    :return: the process wide DriverPool for that kind, created on first use
+    """
+    with _pools_lock:
+        pool = _pools.get(kind)
+        if not pool:
+            factory, size = DRIVER_KINDS[kind]
+            pool = DriverPool(factory, size=size, name=kind)
+            _pools[kind] = pool
+        return pool
+
+
+def driver(kind):
+    return get_pool(kind).driver()
+
+
+def stats():
+    return {kind: pool.stats() for kind, pool in list(_pools.items())}
+
+
+@atexit.register
+def close_all():
+    for pool in list(_pools.values()):
+        pool.close()
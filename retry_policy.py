@@ -0,0 +1,295 @@
+import functools
+import random
+import socket
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+
+# statuses worth another try, anything else (404, 403, ...) is an answer, not a hiccup
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504, 520, 521, 522, 523, 524])
+RETRYABLE_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError, socket.timeout, ConnectionError, TimeoutError)
+# matched by name so selenium is not imported here, subclasses like NoSuchElementException are parse errors
+RETRYABLE_SELENIUM_ERRORS = frozenset(['TimeoutException', 'WebDriverException'])
+
+
+class CircuitOpen(Exception):
+    """
+    raised instead of calling a parser while its host is failing, nothing was fetched
+    """
+
+
+class RetryableStatus(requests.exceptions.HTTPError):
+    """
+    the server answered with one of RETRY_STATUSES
+    """
+
+
+def check_response(response):
+    """
+    raise for the statuses that should be retried, the parsers keep handling 404 and friends themselves
+
+    :param response: requests response
+    :return: the response
+    :raises RetryableStatus: for RETRY_STATUSES
+    """
+    if response.status_code in RETRY_STATUSES:
+        response.close()
+        raise RetryableStatus(f'{response.status_code} for {response.url}', response=response)
+    return response
+
+
+def retry_after(response):
+    """
+
+    :param response: requests response, may be None
+    :return: seconds asked for by the Retry-After header, None if absent or unparsable
+    """
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(error):
+    """
+
+    :param error: exception raised by a parser
+    :return: (retryable, seconds the server asked to wait or None)
+    """
+    if isinstance(error, CircuitOpen):
+        return False, None
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        status = response.status_code if response is not None else None
+        return status in RETRY_STATUSES, retry_after(response) if status in (429, 503) else None
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True, None
+    error_type = type(error)
+    if error_type.__module__.startswith('selenium') and error_type.__name__ in RETRYABLE_SELENIUM_ERRORS:
+        return True, None
+    return False, None
+
+
+class CircuitBreaker:
+    """
+    closed until threshold retryable failures in a row, then open for reset_after seconds, then one
+    trial call is let through (half open) and its outcome closes or reopens the circuit
+    """
+
+    def __init__(self, threshold, reset_after, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if self.trial or self.clock() - self.opened_at >= self.reset_after else 'open'
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if self.trial or self.clock() - self.opened_at < self.reset_after:
+            return False
+        self.trial = True
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self):
+        self.failures += 1
+        if self.trial or self.failures >= self.threshold:
+            self.opened_at = self.clock()
+            self.trial = False
+
+
+class RetryPolicy:
+    """
+    retries transient failures (timeouts, connection errors, 5xx, 429) with jittered exponential
+    backoff inside a total deadline per call, fails deterministic errors at once and keeps a circuit
+    breaker per host so a site that is down is skipped instead of waited on
+    """
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=20.0, deadline=45.0, breaker_threshold=5,
+                 breaker_reset_after=120.0, sleep=time.sleep, clock=time.monotonic):
+        """
+
+        :param max_attempts: calls per request including the first
+        :param base_delay: seconds, the backoff before retry n is drawn from [0, base_delay * 2 ** n]
+        :param max_delay: cap of a single backoff
+        :param deadline: seconds a request may spend in total, no retry is started that would end past it
+        :param breaker_threshold: retryable failures in a row that open a host's circuit
+        :param breaker_reset_after: seconds a circuit stays open before a trial call
+        :param sleep: callable(seconds), replaceable for benchmarks
+        :param clock: monotonic clock
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_after = breaker_reset_after
+        self.sleep = sleep
+        self.clock = clock
+        self._breakers = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _breaker(self, host):
+        breaker = self._breakers.get(host)
+        if not breaker:
+            breaker = self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset_after,
+                                                            self.clock)
+        return breaker
+
+    def _count(self, host, **counts):
+        with self._lock:
+            entry = self._metrics.setdefault(host, dict.fromkeys(
+                ('calls', 'attempts', 'retries', 'successes', 'failures', 'non_retryable', 'short_circuited',
+                 'deadline_exceeded'), 0))
+            for name, value in counts.items():
+                entry[name] += value
+
+    def backoff(self, attempt):
+        """
+
+        :param attempt: 0 for the wait after the first failure
+        :return: full jitter delay in seconds
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def is_open(self, url):
+        """
+
+        :return: True while the circuit of the url's host rejects calls
+        """
+        with self._lock:
+            breaker = self._breakers.get(urlparse(url).netloc)
+            return breaker is not None and breaker.state == 'open'
+
+    def call(self, func, url, *args, **kwargs):
+        """
+
+        :param func: callable doing the fetch and parse
+        :param url: url the call is about, its host picks the circuit breaker and the metrics entry
+        :return: what func returns
+        :raises CircuitOpen: when the host's circuit is open, otherwise the last error of func
+        """
+        if getattr(self._local, 'active', False):
+            # nested retried calls (parse_with_rule -> get_amp_url_requests) share the outer budget
+            return func(*args, **kwargs)
+        self._local.active = True
+        try:
+            return self._call(func, url, args, kwargs)
+        finally:
+            self._local.active = False
+
+    def _call(self, func, url, args, kwargs):
+        host = urlparse(url).netloc if isinstance(url, str) else ''
+        with self._lock:
+            allowed = self._breaker(host).allow()
+        if not allowed:
+            self._count(host, calls=1, short_circuited=1)
+            raise CircuitOpen(f'{host} is failing, skipped {url}')
+        self._count(host, calls=1)
+        started = self.clock()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._count(host, attempts=1)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                retryable, wait = classify(e)
+                if not retryable:
+                    with self._lock:
+                        # the site answered, a parser bug says nothing about its health
+                        breaker = self._breaker(host)
+                        if breaker.trial:
+                            breaker.success()
+                    self._count(host, failures=1, non_retryable=1)
+                    raise
+                with self._lock:
+                    self._breaker(host).failure()
+                    allowed = self._breaker(host).state == 'closed'
+                delay = max(self.backoff(attempt - 1), wait or 0)
+                remaining = self.deadline - (self.clock() - started)
+                if attempt >= self.max_attempts or not allowed or delay >= remaining:
+                    self._count(host, failures=1, deadline_exceeded=int(attempt < self.max_attempts and allowed))
+                    print(f'{getattr(func, "__name__", func)} gave up on {url} after {attempt} attempts'
+                          f'\n\terror is: {e.__class__} {e}')
+                    raise
+                self._count(host, retries=1)
+                self.sleep(delay)
+                continue
+            with self._lock:
+                self._breaker(host).success()
+            self._count(host, successes=1)
+            return result
+
+    def stats(self):
+        """
+
+        :return: dict of host -> counters and the circuit state
+        """
+        with self._lock:
+            return {host: dict(entry, circuit=self._breaker(host).state) for host, entry in self._metrics.items()}
+
+    def print_stats(self):
+        for host, entry in sorted(self.stats().items()):
+            print(f"{host or '-'}: {entry['calls']} calls, {entry['attempts']} attempts, {entry['retries']} retries, "
+                  f"{entry['failures']} failed ({entry['non_retryable']} not retryable, "
+                  f"{entry['deadline_exceeded']} out of time), {entry['short_circuited']} skipped, "
+                  f"circuit {entry['circuit']}")
+
+
+default_policy = RetryPolicy()
+
+
+def configure(**kwargs):
+    """
+    replace the shared policy, takes the same arguments as RetryPolicy
+
+    :return: the new policy
+    """
+    global default_policy
+    default_policy = RetryPolicy(**kwargs)
+    return default_policy
+
+
+def retry(func):
+    """
+    decorator running the wrapped parser under default_policy, looked up per call so configure applies
+    """
+    @functools.wraps(func)
+    def wrapper(method_object, url, *args, **kwargs):
+        return default_policy.call(func, url, method_object, url, *args, **kwargs)
+    return wrapper
+
+
+def stats():
+    return default_policy.stats()
+
+
+def print_stats():
+    default_policy.print_stats()
@@ -0,0 +1,223 @@
+import os
+import re
+from collections import namedtuple
+
+from lxml import etree
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+import html_cleaner
+from html_document import HtmlDocument
+import site_rules
+
+
+# pages at least this big go through the streaming cleaner, it holds a fraction of the memory of a
+# full tree but costs more cpu than the compiled xpath sweep on small pages
+STREAM_MIN_BYTES = int(os.environ.get('STREAM_CLEAN_MIN_BYTES', 1024 * 1024))
+
+Compiled_Rule = namedtuple(typename='Compiled_Rule',
+                           field_names=['Rule', 'Container', 'Drop', 'Header', 'Only', 'Cleaner'])
+
+
+def _selector(css):
+    return CSSSelector(css, translator='html') if css else None
+
+
+def _text(element):
+    return ''.join(element.itertext()).strip()
+
+
+def _link_header(header_tag, input_url):
+    header_text = _text(header_tag)
+    for child in list(header_tag):
+        header_tag.remove(child)
+    header_tag.text = None
+    link = etree.SubElement(header_tag, 'a', href=input_url)
+    link.text = header_text
+
+
+def _rewrite_header(element, captured):
+    if captured.get('header') is element:
+        _link_header(element, captured['input_url'])
+        captured['header_inline'] = True
+
+
+def _first(doc, css):
+    found = CSSSelector(css, translator='html')(doc)
+    return found[0] if found else None
+
+
+def _empty_class_divs(element):
+    # class="" or class="class", the way the page marks its unnamed layout divs
+    return [div for div in element.iterdescendants('div')
+            if div.get('class') is not None and (not div.get('class').split() or 'class' in div.get('class').split())]
+
+
+def hindu_empty_class_divs(doc):
+    """
+    the second and the fourth unnamed layout div of div.article hold page furniture, not article text
+    """
+    article = _first(doc, 'div.article')
+    if article is None:
+        return
+    for index in (1, 2):
+        divs = _empty_class_divs(article)
+        if len(divs) > index:
+            divs[index].drop_tree()
+
+
+def taipei_author_line(doc):
+    """
+    the lists of div.archives go (share links, tags), the author from div.name is put back as a one item
+    list right under the headline
+    """
+    author = _first(doc, 'div.name')
+    author_text = ''.join(author.itertext()) if author is not None else None
+    archives = _first(doc, 'div.archives')
+    if archives is not None:
+        for unwanted in list(archives.iter('ul')):
+            if unwanted.getparent() is not None:
+                unwanted.drop_tree()
+    header_tag = _first(doc, 'h1')
+    if author_text is not None and header_tag is not None:
+        author_list = etree.Element('ul')
+        etree.SubElement(author_list, 'li').text = author_text
+        header_tag.addnext(author_list)
+
+
+# Site_Rule.Hook name -> callable(doc) changing the lxml tree in place
+HOOKS = {
+    'hindu_empty_class_divs': hindu_empty_class_divs,
+    'taipei_author_line': taipei_author_line,
+}
+
+
+def _stream_cleaner(rule):
+    if rule.Keep_Styles or rule.Hook:
+        return None
+    capture = {'title': 'title'}
+    if rule.Header:
+        capture['header'] = rule.Header
+    try:
+        return html_cleaner.StreamCleaner(rule.Container, drop=rule.Drop, only=rule.Only, capture=capture,
+                                          rewrite=_rewrite_header if rule.Header else None)
+    except ValueError:
+        # selectors needing the whole tree (child or sibling combinators, pseudo classes)
+        return None
+
+
+def compile_rule(rule):
+    """
+
+    :param rule: site_rules.Site_Rule
+    :return: Compiled_Rule holding the css selectors translated to xpath once and, when the selectors
+             allow it, the single pass html_cleaner.StreamCleaner used instead of them
+    """
+    if rule.Hook and rule.Hook not in HOOKS:
+        raise ValueError(f'{rule.Name}: unknown hook {rule.Hook!r}')
+    return Compiled_Rule(rule, _selector(rule.Container), _selector(rule.Drop), _selector(rule.Header),
+                         _selector(rule.Only), _stream_cleaner(rule))
+
+
+def compile_rules(rules=None):
+    """
+
+    :param rules: Site_Rule list, site_rules.RULES when None
+    :return: dict of rule Name -> Compiled_Rule
+    """
+    return {rule.Name: compile_rule(rule) for rule in (rules if rules is not None else site_rules.RULES)}
+
+
+COMPILED_RULES = compile_rules()
+
+
+def fetch_url(rule, input_url):
+    """
+
+    :return: url the page is fetched from, input_url unless the rule rewrites it
+    """
+    if not rule.Url:
+        return input_url
+    scheme, _, rest = input_url.partition('://')
+    netloc, slash, path = rest.partition('/')
+    return rule.Url.format(url=input_url, scheme=scheme, netloc=netloc, path=slash + path)
+
+
+def skipped(rule, input_url, title=''):
+    return any(word in input_url or word in (title or '') for word in rule.Skip)
+
+
+def _tostring(element):
+    return etree.tostring(element, encoding='unicode', method='html', with_tail=False)
+
+
+def extract(compiled, content, input_url, title=None, stylesheet=''):
+    """
+    clean a fetched page with lxml, no BeautifulSoup tree involved. big pages of rules with a Cleaner are
+    streamed in one pass, the rest are parsed into a tree and swept by the compiled selectors
+
+    :param compiled: Compiled_Rule
+    :param content: page string, see html_cleaner.decode_page. bytes are decoded by lxml, as latin-1 unless
+                    the page declares a charset
+    :param input_url: article url the headline links to
+    :param title: title found with the amp link, the page <title> when None
+    :param stylesheet: html put into the head, e.g. add_print_css()
+    :return: html string and title, (None, None) when the rule skips the article
+    """
+    if compiled.Cleaner and len(content) >= STREAM_MIN_BYTES:
+        return _stream_extract(compiled, content, input_url, title, stylesheet)
+    rule = compiled.Rule
+    if isinstance(content, str):
+        content = html_cleaner.strip_xml_declaration(content)
+    doc = lxml_html.fromstring(content)
+    if not title:
+        title = re.sub(r'^\s+', '', doc.findtext('.//title') or '')
+    if skipped(rule, input_url, title):
+        return None, None
+    page_styles = [_tostring(style) for style in doc.iter('style')] if rule.Keep_Styles else []
+    if rule.Hook:
+        HOOKS[rule.Hook](doc)
+    if compiled.Drop is not None:
+        for unwanted in compiled.Drop(doc):
+            if unwanted.getparent() is not None:
+                unwanted.drop_tree()
+    containers = []
+    for element in compiled.Container(doc):
+        # a match nested in an earlier one is already part of it
+        if not any(container in element.iterancestors() for container in containers):
+            containers.append(element)
+    if not containers:
+        raise ValueError(f'{rule.Name}: no element matches {rule.Container!r}')
+    document = HtmlDocument(title, stylesheet).add_head(*page_styles)
+    header_list = compiled.Header(doc) if compiled.Header is not None else []
+    if header_list:
+        header_tag = header_list[0]
+        if any(container is header_tag or container in header_tag.iterancestors() for container in containers):
+            _link_header(header_tag, input_url)
+        else:
+            document.add_header_link(input_url, _text(header_tag))
+    for container in containers:
+        if compiled.Only is not None:
+            document.extend(_tostring(element) for element in compiled.Only(container))
+        else:
+            document.add(_tostring(container))
+    return document.render(), title
+
+
+def _stream_extract(compiled, content, input_url, title, stylesheet):
+    rule = compiled.Rule
+    if skipped(rule, input_url, title):
+        return None, None
+    captured = {'input_url': input_url}
+    parts = list(compiled.Cleaner.clean(html_cleaner.iter_chunks(content), captured))
+    if not title:
+        title = re.sub(r'^\s+', '', ''.join(captured['title'].itertext()) if 'title' in captured else '')
+        if skipped(rule, input_url, title):
+            return None, None
+    if not parts:
+        raise ValueError(f'{rule.Name}: no element matches {rule.Container!r}')
+    document = HtmlDocument(title, stylesheet)
+    header_tag = captured.get('header')
+    if header_tag is not None and not captured.get('header_inline'):
+        document.add_header_link(input_url, _text(header_tag))
+    return document.extend(parts).render(), title
@@ -0,0 +1,166 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from difflib import SequenceMatcher
+from urllib.parse import unquote, urlparse
+
+
+_SPACE = re.compile(r'\s+')
+_SEPARATORS = re.compile(r'[-_/.+%\s]+')
+
+
+def _ratio(matches, length):
+    # difflib's own arithmetic, so a bound and ratio() agree at the threshold
+    return 2.0 * matches / length if length else 1.0
+
+
+def normalize_url(url):
+    """
+    scheme, www, query, fragment, case, percent encoding and trailing slashes do not make two
+    article urls different
+
+    :param url: article url
+    :return: 'host/path' with the slug words joined by single dashes
+    """
+    parsed_uri = urlparse(unquote(url.strip()))
+    host = parsed_uri.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    path = '/'.join(_SEPARATORS.sub('-', part).strip('-') for part in parsed_uri.path.lower().split('/') if part)
+    return f'{host}/{path}' if host else path
+
+
+def normalize_text(text):
+    """
+
+    :param text: link text or title
+    :return: lower case, whitespace collapsed
+    """
+    return _SPACE.sub(' ', text).strip().lower()
+
+
+class SimilarityIndex:
+    """
+    strings (archived article urls, link texts) indexed by length and character counts so a lookup
+    runs difflib's ratio on a shortlist instead of on every entry. both cuts are upper bounds of the
+    ratio (real_quick_ratio and quick_ratio), so nothing at or above the threshold is ever missed:
+    only lengths with 2 * shorter / (sum of lengths) >= threshold are visited, and entries whose
+    shared character counts cannot reach it are skipped before SequenceMatcher runs
+    """
+
+    def __init__(self, items=(), normalize=normalize_url):
+        """
+
+        :param items: strings, or (string, value) pairs whose value is returned on a match
+        :param normalize: callable(string) -> key the similarity is computed on
+        """
+        self.normalize = normalize
+        self._entries = {}
+        self._by_length = {}
+        # sorted distinct key lengths of the entries, for the length window of candidates
+        self._lengths = []
+        self._next_id = 0
+        for item in items:
+            if isinstance(item, tuple):
+                self.add(*item)
+            else:
+                self.add(item)
+
+    def add(self, item, value=None):
+        """
+
+        :param item: string to index
+        :param value: returned by best/matches instead of item, e.g. the href of a link text
+        :return: entry id
+        """
+        key = self.normalize(item)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (item, item if value is None else value, key, Counter(key))
+        if len(key) not in self._by_length:
+            self._by_length[len(key)] = set()
+            insort(self._lengths, len(key))
+        self._by_length[len(key)].add(entry_id)
+        return entry_id
+
+    def remove(self, entry_id):
+        item, value, key, counts = self._entries.pop(entry_id)
+        same_length = self._by_length[len(key)]
+        same_length.discard(entry_id)
+        if not same_length:
+            del self._by_length[len(key)]
+            del self._lengths[bisect_left(self._lengths, len(key))]
+        return item
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        """
+        remaining items in the order they were added
+        """
+        return (entry[0] for entry in self._entries.values())
+
+    def candidates(self, query_key, threshold):
+        """
+
+        :param query_key: normalized query
+        :param threshold: similarity the caller is after
+        :return: ids of the entries whose ratio can reach threshold
+        """
+        query_length = len(query_key)
+        if threshold > 0:
+            # 2 * min(q, l) / (q + l) >= t  <=>  q * t / (2 - t) <= l <= q * (2 - t) / t, widened by one
+            # for the float rounding and checked exactly below
+            low = bisect_left(self._lengths, query_length * threshold / (2 - threshold) - 1)
+            high = bisect_right(self._lengths, query_length * (2 - threshold) / threshold + 1)
+        else:
+            low, high = 0, len(self._lengths)
+        query_counts = Counter(query_key).items()
+        result = []
+        for length in self._lengths[low:high]:
+            total = query_length + length
+            if _ratio(min(query_length, length), total) < threshold:
+                continue
+            for entry_id in self._by_length[length]:
+                counts = self._entries[entry_id][3]
+                shared = sum(min(count, counts[char]) for char, count in query_counts if char in counts)
+                if _ratio(shared, total) >= threshold:
+                    result.append(entry_id)
+        return result
+
+    def matches(self, query, threshold):
+        """
+
+        :param query: string compared like the indexed items
+        :param threshold: minimum SequenceMatcher ratio of the normalized strings
+        :return: list of (ratio, entry id, value), best first
+        """
+        query_key = self.normalize(query)
+        found = []
+        matcher = SequenceMatcher(None, autojunk=False)
+        # SequenceMatcher caches its analysis of the second sequence, keep the query there
+        matcher.set_seq2(query_key)
+        for entry_id in self.candidates(query_key, threshold):
+            matcher.set_seq1(self._entries[entry_id][2])
+            ratio = matcher.ratio()
+            if ratio >= threshold:
+                found.append((ratio, entry_id, self._entries[entry_id][1]))
+        found.sort(key=lambda match: (-match[0], match[1]))
+        return found
+
+    def best(self, query, threshold):
+        """
+
+        :return: value of the most similar entry, None if none reaches threshold
+        """
+        found = self.matches(query, threshold)
+        return found[0][2] if found else None
+
+    def discard_similar(self, query, threshold):
+        """
+        remove every entry at least threshold similar to query, e.g. archived urls already compiled
+
+        :return: list of the removed items
+        """
+        return [self.remove(entry_id) for _, entry_id, _ in self.matches(query, threshold)]
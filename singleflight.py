@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    runs one call per key at a time, callers arriving while it runs wait and share its result.
+    threads of one process coalesce on an Event, other processes (gunicorn or job workers) queue
+    on a lock file and are expected to find the leader's result through recheck
+    """
+
+    def __init__(self, lock_dir=None):
+        """
+
+        :param lock_dir: folder for the per key lock files, None coalesces within this process only
+        """
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {'leaders': 0, 'followers': 0, 'rechecked': 0}
+
+    @contextmanager
+    def _file_lock(self, key):
+        if not self.lock_dir:
+            yield
+            return
+        os.makedirs(self.lock_dir, exist_ok=True)
+        lock_path = os.path.join(self.lock_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+        with open(lock_path, 'a+b') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                # LK_LOCK gives up after ~10s, keep trying like flock would
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def do(self, key, fn, recheck=None):
+        """
+
+        :param key: identifies the work, e.g. the canonical article url
+        :param fn: callable doing the work
+        :param recheck: callable run by the leader once it holds the lock file, a result other than None
+                        is used instead of calling fn (another process finished the same work first)
+        :return: (result, leader), leader is False when the result was produced for another caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.counters['leaders'] += 1
+            else:
+                self.counters['followers'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result, False
+        try:
+            with self._file_lock(key):
+                result = recheck() if recheck else None
+                if result is not None:
+                    self.counters['rechecked'] += 1
+                    leader = False
+                else:
+                    result = fn()
+            call.result = result
+            return result, leader
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
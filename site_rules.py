@@ -0,0 +1,129 @@
+from collections import namedtuple
+
+
+# one entry per site handled by rule_engine instead of a hand written parse_* method.
+# Name: referred to by Fallback and shown in logs
+# Hosts: dispatch keys ('scheme://netloc/', optionally with a path prefix) served by this rule, www/m/amp
+#        subdomains, other schemes and ports of them are routed here as well
+# Container: css selector group, every match in document order goes into the body
+# Drop: css selector group removed from the whole page before the containers are taken
+# Header: css selector of the headline, rewritten into a link to the article; when it lies outside the
+#         containers a linked <h1> is put in front of them
+# Only: css selector, when set only these descendants of the containers are kept
+# Profile: http_session header profile for the article fetch
+# Amp: fetch the amp page found through the rel=amphtml link instead of the url itself
+# Url: fetch this instead of the url, formatted with url, scheme, netloc and path (path includes the query)
+# Browser: renderer_pool kind loading the page when the fetch comes back 404
+# Fallback: rule Name or GetResourceMethods method used when no amp page is found
+# Skip: substrings of the url or title for which nothing is compiled
+# Divert: (url substring, rule Name or method) pairs handled elsewhere
+# Stylesheet: file put into the head, print.css or a site specific one
+# Keep_Styles: copy the page's own <style> tags
+# Hook: name of a rule_engine.HOOKS function changing the parsed page before Drop, for quirks no selector
+#       expresses. pages of rules with a Hook are never streamed
+Site_Rule = namedtuple(typename='Site_Rule',
+                       field_names=['Name', 'Hosts', 'Container', 'Drop', 'Header', 'Only', 'Profile', 'Amp', 'Url',
+                                    'Browser', 'Fallback', 'Skip', 'Divert', 'Stylesheet', 'Keep_Styles', 'Hook'],
+                       defaults=[None, None, None, None, False, None, None, None, (), (), 'print.css', False, None])
+
+RULES = [
+    Site_Rule(
+        Name='mercury',
+        Hosts=('https://www.theguardian.com/', 'https://www.globaltimes.cn/', 'https://www.nytimes.com/'),
+        Container='article',
+        Drop='figure, aside, amp-img, div.hg-social-logo-block',
+        Header='h1.hg-title',
+        Url='https://mercury.postlight.com/amp?url={url}',
+        Browser='firefox_profile',
+        Keep_Styles=True,
+    ),
+    Site_Rule(
+        Name='wsj',
+        Hosts=('https://www.wsj.com/',),
+        Container='main#main',
+        Drop='div.share-bar, div.media-object, div.wsj-ad, script, style, div[amp-access="NOT access"]',
+        Header='h1.wsj-article-headline',
+        Url='{scheme}://{netloc}/amp{path}',
+        Stylesheet='wsj_style.css',
+    ),
+    Site_Rule(
+        Name='hindu',
+        Hosts=('https://www.thehindu.com/',),
+        Container='div.article',
+        Drop='img, script, .support-jlm, .articlebelowtextad, .media-body, .subarticlepay, .dfp-ad, '
+             '.img-full-width, .clear',
+        Header='h1.title, h1.special-heading, h1.headline',
+        Skip=('cartoonscape', 'Mathrubootham'),
+        Divert=(('/thread/', 'parse_other'),),
+        Hook='hindu_empty_class_divs',
+    ),
+    Site_Rule(
+        Name='indian_express',
+        Hosts=('https://indianexpress.com/',),
+        Container='div.full-details',
+        Drop='div.share-social, img.size-full, img.size-medium, noscript, script, .appstext, .storytags, '
+             '.more-from, .abbott-disc, .embed-youtube, .custom-caption, .inhouseimg, .ie-int-campign-ad, '
+             '.pdsc-related-modify, #id_newsletter_subscription, #story_content_parts, [id^="div-gpt-ad"]',
+        Header='h1.native_story_title',
+    ),
+    Site_Rule(
+        Name='livemint',
+        Hosts=('https://www.livemint.com/',),
+        Container='div.mainSec',
+        Drop='div.bcrumb, div.promotion, div.share-icons-box, div.epaperPromo, '
+             'section[amp-access="NOT subscribed AND decision"], figure, aside, amp-ad',
+        Header='div.mainSec h1',
+        Amp=True,
+    ),
+    Site_Rule(
+        Name='taipei_times',
+        Hosts=('https://www.taipeitimes.com/',),
+        Container='div.archives',
+        Drop='div.imgboxa, div.boxTitle',
+        Header='h1',
+        Hook='taipei_author_line',
+    ),
+    Site_Rule(
+        Name='dte',
+        Hosts=('https://www.downtoearth.org.in/',),
+        Container='div.news-detail',
+        Drop='amp-img, .captionStory, .add-comment, .flexible-item, .latest-article, .read-post-comment-div, '
+             '.donate-text, div.news-detail header',
+        Header='h1',
+        Amp=True,
+        Fallback='parse_outline_url',
+    ),
+    Site_Rule(
+        Name='hkfp',
+        Hosts=('https://hongkongfp.com/',),
+        Container='div.entry-content',
+        Drop='div.entry-content figure, div.entry-content aside, div.entry-content section',
+        Header='h1.entry-title',
+        Only='p',
+    ),
+    Site_Rule(
+        Name='economist',
+        Hosts=('https://www.economist.com/',),
+        Container='header.article__header, div.layout-article-body',
+        Drop='div.layout-article-links, div.layout-article-body figure, div.advert, iframe',
+        Header='span.article__headline',
+        Amp=True,
+    ),
+    Site_Rule(
+        Name='perspective_anthro',
+        Hosts=('https://perspectivesinanthropology.com/',),
+        Container='article.amp-wp-article',
+        Drop='article footer, div.sharedaddy, nav[data-layout="grid"], amp-img',
+        Header='h1.amp-wp-title',
+        Amp=True,
+        Fallback='mercury',
+    ),
+    Site_Rule(
+        Name='dawn',
+        Hosts=('https://www.dawn.com/',),
+        Container='h1.story__title, div.story__meta, div.story__content',
+        Drop='.amp-ad-container',
+        Header='h1.story__title',
+        Amp=True,
+    ),
+]
@@ -0,0 +1,235 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import closing
+
+import article_cache
+
+
+STATE_STORE_PATH = os.environ.get('STATE_STORE_PATH', 'state.sqlite3')
+# candidate: archived economist/epw articles to pick from, queued: urls waiting for a run (the 'manual'
+# and 'auto' sheets), done: compiled urls, seen: every article an edition crawl has found, kept when it
+# leaves the candidates so it is not added back
+STATES = ('candidate', 'queued', 'done', 'seen')
+DONE_SOURCE = 'done-urls'
+
+# a weekly edition index page as last fetched, Etag and Last_Modified are sent back on the next crawl
+Edition = namedtuple(typename='Edition',
+                     field_names=['Source', 'Url', 'Etag', 'Last_Modified', 'Articles', 'Checked_At'])
+
+
+class StateStore:
+    """
+    the url lists of the daily run in a local sqlite file instead of economist.txt, epw.txt and the
+    N_Today.xlsx sheets: each (source, state) list keeps its order, urls are deduplicated on the
+    canonical url and changes are single transactions instead of rewriting the files
+    """
+
+    def __init__(self, db_path=STATE_STORE_PATH):
+        """
+
+        :param db_path: sqlite file
+        """
+        self.db_path = db_path
+        self._init_lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    with closing(sqlite3.connect(self.db_path, timeout=30)) as conn, conn:
+                        conn.execute('PRAGMA journal_mode=WAL')
+                        conn.execute('CREATE TABLE IF NOT EXISTS urls (id INTEGER PRIMARY KEY, '
+                                     'source TEXT NOT NULL, state TEXT NOT NULL, url TEXT NOT NULL, '
+                                     'key TEXT NOT NULL, added_at REAL NOT NULL, UNIQUE (source, state, key))')
+                        conn.execute('CREATE INDEX IF NOT EXISTS urls_state_key ON urls (state, key)')
+                        conn.execute('CREATE TABLE IF NOT EXISTS editions (url TEXT PRIMARY KEY, source TEXT NOT NULL, '
+                                     'etag TEXT, last_modified TEXT, articles INTEGER NOT NULL DEFAULT 0, '
+                                     'checked_at REAL NOT NULL)')
+                    self._ready = True
+        return closing(sqlite3.connect(self.db_path, timeout=30))
+
+    @staticmethod
+    def _check_state(state):
+        if state not in STATES:
+            raise ValueError(f'unknown state {state!r}, expected one of {STATES}')
+
+    @staticmethod
+    def _rows(source, state, url_list, now):
+        return [(source, state, url, article_cache.canonical_url(url), now) for url in url_list if url]
+
+    def append(self, source, state, url_list):
+        """
+
+        :param source: list name, e.g. 'economist', 'epw', 'manual', 'auto'
+        :param state: one of STATES
+        :param url_list: urls added at the end of the list, ones already in it are skipped
+        :return: number of urls added
+        """
+        self._check_state(state)
+        with self._connect() as conn, conn:
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO urls (source, state, url, key, added_at) VALUES (?, ?, ?, ?, ?)',
+                             self._rows(source, state, url_list, time.time()))
+            return conn.total_changes - before
+
+    def replace(self, source, state, url_list):
+        """
+        swap a whole list in one transaction, readers see the old or the new list
+
+        :return: number of urls stored
+        """
+        self._check_state(state)
+        with self._connect() as conn, conn:
+            conn.execute('DELETE FROM urls WHERE source = ? AND state = ?', (source, state))
+            conn.executemany('INSERT OR IGNORE INTO urls (source, state, url, key, added_at) VALUES (?, ?, ?, ?, ?)',
+                             self._rows(source, state, url_list, time.time()))
+            return conn.execute('SELECT COUNT(*) FROM urls WHERE source = ? AND state = ?',
+                                (source, state)).fetchone()[0]
+
+    def remove(self, source, state, url_list):
+        """
+
+        :return: number of urls removed
+        """
+        with self._connect() as conn, conn:
+            before = conn.total_changes
+            conn.executemany('DELETE FROM urls WHERE source = ? AND state = ? AND key = ?',
+                             [(source, state, article_cache.canonical_url(url)) for url in url_list if url])
+            return conn.total_changes - before
+
+    def urls(self, source, state):
+        """
+
+        :return: the urls of the list in the order they were added
+        """
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute('SELECT url FROM urls WHERE source = ? AND state = ? ORDER BY id',
+                                                   (source, state))]
+
+    def count(self, source, state):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM urls WHERE source = ? AND state = ?',
+                                (source, state)).fetchone()[0]
+
+    def mark_done(self, url_list, source=DONE_SOURCE):
+        """
+        record compiled urls, what the 'done-urls' sheet was appended with
+
+        :return: number of urls not already done
+        """
+        return self.append(source, 'done', url_list)
+
+    def done_urls(self, url_list):
+        """
+
+        :param url_list: urls to check
+        :return: set of the ones already compiled, whatever their source
+        """
+        keys = {article_cache.canonical_url(url): url for url in url_list if url}
+        found = set()
+        with self._connect() as conn:
+            for key, url in keys.items():
+                if conn.execute("SELECT 1 FROM urls WHERE state = 'done' AND key = ? LIMIT 1", (key,)).fetchone():
+                    found.add(url)
+        return found
+
+    def is_done(self, url):
+        return bool(self.done_urls([url]))
+
+    def edition(self, url):
+        """
+
+        :param url: edition index url
+        :return: Edition or None if it was never crawled
+        """
+        with self._connect() as conn:
+            row = conn.execute('SELECT source, url, etag, last_modified, articles, checked_at FROM editions '
+                               'WHERE url = ?', (url,)).fetchone()
+        return Edition(*row) if row else None
+
+    def save_edition(self, source, url, etag=None, last_modified=None, articles=0):
+        """
+        record a crawl of an edition index, the validators of the response replace the stored ones
+
+        :param articles: article links found on the page
+        """
+        with self._connect() as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO editions (url, source, etag, last_modified, articles, checked_at) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', (url, source, etag, last_modified, articles, time.time()))
+
+    def touch_edition(self, url):
+        """
+        the edition answered 304, only the time it was checked changes
+        """
+        with self._connect() as conn, conn:
+            conn.execute('UPDATE editions SET checked_at = ? WHERE url = ?', (time.time(), url))
+
+    def unseen(self, source, url_list):
+        """
+
+        :param url_list: article urls found by a crawl
+        :return: the ones not seen for source yet, in order and without duplicates
+        """
+        result, keys = [], set()
+        with self._connect() as conn:
+            for url in url_list:
+                key = article_cache.canonical_url(url)
+                if key in keys:
+                    continue
+                keys.add(key)
+                if not conn.execute("SELECT 1 FROM urls WHERE source = ? AND state = 'seen' AND key = ? LIMIT 1",
+                                    (source, key)).fetchone():
+                    result.append(url)
+        return result
+
+    def import_files(self, economist_path='economist.txt', epw_path='epw.txt', workbook_path='N_Today.xlsx'):
+        """
+        load the state kept by earlier versions, missing files are skipped. the lists are appended to,
+        so running it twice does not duplicate anything
+
+        :return: dict of 'source/state' -> urls added
+        """
+        added = {}
+        for source, path in (('economist', economist_path), ('epw', epw_path)):
+            if path and os.path.exists(path):
+                with open(path) as url_file:
+                    url_list = [line.strip() for line in url_file]
+                added[f'{source}/candidate'] = self.append(source, 'candidate', url_list)
+                self.append(source, 'seen', url_list)
+        if workbook_path and os.path.exists(workbook_path):
+            import openpyxl
+            workbook = openpyxl.load_workbook(workbook_path, read_only=True)
+            for sheet_name, state in (('manual', 'queued'), ('auto', 'queued'), (DONE_SOURCE, 'done')):
+                if sheet_name not in workbook.sheetnames:
+                    continue
+                url_list = [row[0] for row in workbook[sheet_name].iter_rows(min_col=1, max_col=1, values_only=True)
+                            if row[0]]
+                added[f'{sheet_name}/{state}'] = self.append(sheet_name, state, url_list)
+            workbook.close()
+        return added
+
+
+default_store = StateStore()
+
+
+def main(args):
+    """
+    `python state_store.py import [economist.txt epw.txt N_Today.xlsx]` moves the old files in,
+    `python state_store.py add manual URL...` queues urls like typing them into the manual sheet did
+    """
+    if args and args[0] == 'import':
+        for name, number in default_store.import_files(*args[1:4]).items():
+            print(f'{name}: {number} urls imported')
+    elif len(args) > 2 and args[0] == 'add':
+        print(f'{default_store.append(args[1], "queued", args[2:])} urls queued in {args[1]}')
+    else:
+        print(main.__doc__)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])